@@ -9,9 +9,13 @@ Author: Alberto Barrago
 License: BSD 3-Clause License - 2025
 """
 
+import asyncio
 import os
+import sys
+import threading
+from pathlib import Path
 
-from apollo.service.session import save_user_history_to_json
+from apollo.service.log import setup_logging, stop_logging
 from apollo.tools.search import (
     codebase_search,
     file_search,
@@ -24,11 +28,67 @@ from apollo.config.const import Constant
 from apollo.tools.web import web_search, wiki_search
 
 
+async def _read_input(prompt: str) -> str:
+    """
+    Read a line from the terminal without blocking the event loop.
+
+    The read runs in a daemon thread rather than the default executor:
+    asyncio.run waits for the executor threads on exit, which would keep a
+    Ctrl+C exit hanging until the pending input() returned.
+
+    Args:
+        prompt: The prompt to show before reading.
+
+    Returns:
+        The line entered, without the trailing newline.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def settle(line, error) -> None:
+        if future.done():  # The waiting chat was cancelled meanwhile
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(line)
+
+    def read() -> None:
+        try:
+            line, error = input(prompt), None
+        except (EOFError, KeyboardInterrupt) as e:
+            line, error = None, e
+        try:
+            loop.call_soon_threadsafe(settle, line, error)
+        except RuntimeError:  # The loop is already closed
+            pass
+
+    threading.Thread(target=read, name="apollo-input", daemon=True).start()
+    return await future
+
+
 class ApolloAgent:
     """
     ApolloAgent is a custom AI agent that implements various functions for code assistance.
     """
 
+    # Tool name -> implementation, shared by every agent instance
+    _TOOL_FUNCTIONS = {
+        # File operations (core functionality)
+        "create_file": create_file,
+        "edit_file": edit_file,
+        "list_dir": list_dir,
+        "delete_file": delete_file,
+        "remove_dir": remove_dir,
+        # Search operations (by increasing scope/complexity)
+        "file_search": file_search,
+        "grep_search": grep_search,
+        "codebase_search": codebase_search,
+        # External information sources
+        "web_search": web_search,
+        "wiki_search": wiki_search,
+    }
+
     def __init__(self, workspace_path: str = None):
         """
         Initialize the ApolloAgent with a workspace path.
@@ -47,23 +107,7 @@ class ApolloAgent:
         self.chat_agent.set_tool_executor(self.tool_executor)
 
         # Register functions with the tool executor
-        self.tool_executor.register_functions(
-            {
-                # File operations (core functionality)
-                "create_file": create_file,
-                "edit_file": edit_file,
-                "list_dir": list_dir,
-                "delete_file": delete_file,
-                "remove_dir": remove_dir,
-                # Search operations (by increasing scope/complexity)
-                "file_search": file_search,
-                "grep_search": grep_search,
-                "codebase_search": codebase_search,
-                # External information sources
-                "web_search": web_search,
-                "wiki_search": wiki_search,
-            }
-        )
+        self.tool_executor.register_functions(self._TOOL_FUNCTIONS)
 
     async def execute_tool(self, tool_call):
         """
@@ -80,44 +124,76 @@ class ApolloAgent:
         """Start a Chat Session in the terminal."""
         print(Constant.apollo_welcome)
         workspace_cabled = Constant.workspace_cabled
-
-        if not os.path.exists(workspace_cabled) and workspace_cabled != "exit":
-            os.makedirs(workspace_cabled)
         if workspace_cabled == "exit":
             return
 
-        agent = ApolloAgent(workspace_path=workspace_cabled)
+        setup_logging()
+
+        # Resolve the workspace once; tools then work from an absolute path
+        workspace = Path(workspace_cabled)
+        workspace.mkdir(parents=True, exist_ok=True)
+        workspace_path = str(workspace.resolve())
+
+        agent = ApolloAgent(workspace_path=workspace_path)
         print(
             "🌟 Welcome to ApolloAgent Chat Mode!"
             "\n > Type 'exit' to end the conversation."
             "\n > Now in BETA MODE the workspace is set to:",
-            os.path.abspath(workspace_cabled),
+            workspace_path,
         )
 
-        while True:
-            try:
-                user_input = input("\n> You: ")
-                if user_input.lower() == "exit":
+        streamed_tokens: list[str] = []
+        # Flush every token on a terminal; when piped, let the stream buffer them
+        flush_tokens = sys.stdout.isatty()
+
+        def print_token(token: str) -> None:
+            # Show the answer as it is generated instead of after the last token
+            if not streamed_tokens:
+                print("\n🤖 ", end="")
+            streamed_tokens.append(token)
+            print(token, end="", flush=flush_tokens)
+
+        agent.chat_agent.on_token = print_token
+
+        try:
+            while True:
+                try:
+                    # Read in a worker thread so the event loop keeps running while the user types
+                    user_input = await _read_input("\n> You: ")
+                    if user_input.lower() == "exit":
+                        break
+                    agent.chat_agent.persist_message(user_input, "user")
+
+                    prompt = (
+                        f"Follow this instructions:{ Constant.prompt_reinforcement_dev_v2}"
+                        f" The command is: ${user_input}"
+                    )
+                    # The magic begin
+                    streamed_tokens.clear()
+                    response = await agent.chat_agent.handle_request(prompt)
+
+                    if (
+                        response
+                        and isinstance(response, dict)
+                        and "response" in response
+                    ):
+                        answer = str(response["response"]).partition("] ")[2]
+                        if answer and "".join(streamed_tokens).endswith(answer):
+                            print()  # The answer is already on screen
+                        else:
+                            print(f"\n🤖 {response['response']}")
+                    elif (
+                        response and isinstance(response, dict) and "error" in response
+                    ):
+                        print(f"🤖 Apollo (Error): {response['error']}")
+                    else:
+                        print(f"🤖 Apollo (Unexpected Response Format): {response}")
+
+                except (EOFError, KeyboardInterrupt, asyncio.CancelledError):
+                    # Ctrl+C reaches us as CancelledError: asyncio.run cancels this task
+                    print("\nExiting chat.")
                     break
-                save_user_history_to_json(message=user_input, role="user")
-
-                prompt = (
-                    f"Follow this instructions:{ Constant.prompt_reinforcement_dev_v2}"
-                    f" The command is: ${user_input}"
-                )
-                # The magic begin
-                response = await agent.chat_agent.handle_request(prompt)
-
-                if response and isinstance(response, dict) and "response" in response:
-                    print(f"\n🤖 {response['response']}")
-                elif response and isinstance(response, dict) and "error" in response:
-                    print(f"🤖 Apollo (Error): {response['error']}")
-                else:
-                    print(f"🤖 Apollo (Unexpected Response Format): {response}")
-
-            except EOFError:
-                print("\nExiting chat.")
-                break
-            except KeyboardInterrupt:
-                print("\nExiting chat.")
-                break
+        finally:
+            # Flush the queued history writes and log records on every exit path
+            await agent.chat_agent.aclose()
+            stop_logging()
@@ -31,11 +31,23 @@ class Constant:
 """
     # LLM settings
     llm_model = "llama3.1"
+    # Smaller model for short conversational requests, e.g. "llama3.2:1b".
+    # None sends every request to llm_model.
+    chat_llm_model = None
     ollama_host = "http://localhost:11434"
+    # How long Ollama keeps the model (and its prompt cache) loaded between requests
+    ollama_keep_alive = "30m"
+    # Read timeout between streamed chunks of an Ollama response
+    ollama_timeout_seconds = 300.0
 
     # Chat settings
     max_chat_iterations = 10
     max_history_messages = 50
+    # Limits of the history sent to the LLM (tokens estimated at ~4 chars each)
+    max_history_tokens = 8192
+    max_llm_history_messages = 32
+    # LLM answers cached per identical history (0 disables the cache)
+    llm_cache_max_entries = 128
 
     # Prompt v1
     prompt_reinforcement_dev_v1 = """
@@ -0,0 +1,63 @@
+"""
+Logging setup for the ApolloAgent.
+
+Log records from the apollo package are handed to a queue and written to the
+terminal by a background listener thread, so emitting a log line never blocks
+the chat loop on console I/O.
+
+Author: Alberto Barrago
+License: BSD 3-Clause License - 2025
+"""
+
+import logging
+import logging.handlers
+import queue
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+def setup_logging(level: int = logging.INFO) -> logging.handlers.QueueListener:
+    """
+    Route the apollo loggers through a queue to a background stream handler.
+
+    Calling it again returns the already running listener.
+
+    Args:
+        level: The minimum level of the records to emit.
+
+    Returns:
+        The running QueueListener; call stop_logging() to flush it on exit.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("[%(levelname)s] %(message)s"))
+
+    logger = logging.getLogger("apollo")
+    logger.setLevel(level)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    _listener.start()
+    return _listener
+
+
+def stop_logging() -> None:
+    """
+    Flush the pending log records and stop the background listener.
+    """
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    logger = logging.getLogger("apollo")
+    for handler in list(logger.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            logger.removeHandler(handler)
+    logger.setLevel(logging.NOTSET)
+    logger.propagate = True
+    _listener = None
@@ -1,7 +1,7 @@
 """
-In this file, we define functions for saving user chat history to a JSON file.
+In this file, we define functions for saving user chat history to a JSON Lines file.
 The file will be saved in the workspace's chat history
-and will be named 'chat_history_YYYYMMDD.json'.
+and will be named 'chat_history_YYYYMMDD.jsonl', one message per line.
 
 Author: Alberto Barrago
 License: BSD 3-Clause License - 2025
@@ -9,26 +9,113 @@ License: BSD 3-Clause License - 2025
 
 import datetime
 import json
+import logging
 import os
 import time
+from typing import Any, Dict, List
 
 from apollo.config.const import Constant
 
+logger = logging.getLogger(__name__)
+
 
 def get_daily_session_filename(base_dir: str):
     """
     Generates a filename for a daily chat session.
-    The filename will be 'chat_history_YYYYMMDD.json'.
+    The filename will be 'chat_history_YYYYMMDD.jsonl'.
     """
     today_date_str = datetime.date.today().strftime("%Y%m%d")
-    return os.path.join(base_dir, f"chat_history_{today_date_str}.json")
+    return os.path.join(base_dir, f"chat_history_{today_date_str}.jsonl")
+
+
+# Number of records in each session file written by this process, so an append
+# does not need to read the file back to know when to compact it.
+_record_counts: Dict[str, int] = {}
+
+
+def _new_session_marker() -> Dict[str, str]:
+    """
+    Build the system record that opens a daily session file.
+    """
+    return {
+        "role": "system",
+        "content": Constant.system_new_session.format(
+            timestamp=time.strftime("%Y-%m-%d %H:%M:%S")
+        ),
+    }
+
+
+def _is_session_marker(record: Any) -> bool:
+    """
+    Check whether a record is the system marker written at the start of a session.
+    """
+    return (
+        isinstance(record, dict)
+        and record.get("role") == "system"
+        and Constant.system_new_session.split("{", maxsplit=1)[0]
+        in record.get("content", "")
+    )
+
+
+def load_session_history(file_path: str) -> List[Dict[str, Any]]:
+    """
+    Read the records of a session file, skipping lines that are not valid JSON.
+
+    Args:
+        file_path: The JSON Lines file to read.
+
+    Returns:
+        The list of records in file order, or an empty list if the file is missing.
+    """
+    history = []
+    try:
+        with open(file_path, "r", encoding="utf-8") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                try:
+                    history.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning("Skipping corrupted line in '%s'.", file_path)
+    except FileNotFoundError:
+        pass
+    return history
+
+
+def _compact_session(file_path: str, max_messages: int) -> int:
+    """
+    Rewrite a session file with its marker and the last max_messages records.
+
+    Args:
+        file_path: The JSON Lines file to compact.
+        max_messages: The number of chat messages to keep after the marker.
+
+    Returns:
+        The number of records left in the file.
+    """
+    history = load_session_history(file_path)
+    if history and _is_session_marker(history[0]):
+        marker, chat_messages = history[0], history[1:]
+    else:
+        logger.info(
+            "System marker missing or malformed in '%s'. Re-initializing session for today.",
+            file_path,
+        )
+        marker, chat_messages = _new_session_marker(), history
+    trimmed_history = [marker] + chat_messages[-max_messages:]
+
+    with open(file_path, "w", encoding="utf-8") as file:
+        file.writelines(json.dumps(record) + "\n" for record in trimmed_history)
+    return len(trimmed_history)
 
 
 def save_user_history_to_json(message: str, role: str):
     """
-    Save a single new message to a JSON file, maintaining a daily session-based history
-    and trimming old messages to a maximum limit. All messages (system, user, assistant)
-    are saved as dictionaries with 'role' and 'content' keys.
+    Append a single new message to the daily session file in JSON Lines format.
+
+    Each call writes one line, so saving does not grow with the length of the
+    conversation. The file is compacted back to the system marker and the last
+    max_history_messages messages once it holds twice that many.
 
     Args:
        message: The content of the new message to save.
@@ -38,7 +125,7 @@ def save_user_history_to_json(message: str, role: str):
     max_messages = Constant.max_history_messages
 
     if not isinstance(message, str) or not role:
-        print("[WARNING] Invalid message content or role provided. Skipping save.")
+        logger.warning("Invalid message content or role provided. Skipping save.")
         return None
 
     # Ensure the session directory exists
@@ -47,84 +134,29 @@ def save_user_history_to_json(message: str, role: str):
     # Determine the file path for today's session
     file_path = get_daily_session_filename(session_dir)
 
-    current_history = []
-    is_new_session_for_today = False
-
-    if os.path.exists(file_path):
-        try:
-            with open(file_path, "r", encoding="utf-8") as file:
-                existing_data = json.load(file)
-                if isinstance(existing_data, list):
-                    current_history = existing_data
-                else:
-                    print(
-                        f"[WARNING] Existing chat history file '{file_path}' "
-                        f"is not a list. Starting new history for today."
-                    )
-                    is_new_session_for_today = True  # File exists but is malformed
-        except json.JSONDecodeError:
-            print(
-                f"[WARNING] Chat history file '{file_path}' corrupted. Starting new history for today."
-            )
-            is_new_session_for_today = True
-        except FileNotFoundError:  # Should not happen if os.path.exists() was true
-            is_new_session_for_today = True  # Fallback, though unlikely
-
-        # After loading, check if a system marker is present (first message)
-        if not is_new_session_for_today and current_history:
-            is_system_marker_present_at_start = (
-                isinstance(current_history[0], dict)
-                and current_history[0].get("role") == "system"
-                and Constant.system_new_session.split("{", maxsplit=1)[0]
-                in current_history[0].get("content", "")
-            )
-            if not is_system_marker_present_at_start:
-                # If no system marker or it's not the correct one, treat as new session for today
-                print(
-                    f"[INFO] System marker missing or malformed in '{file_path}'. Re-initializing session for today."
-                )
-                is_new_session_for_today = True
-    else:
-        is_new_session_for_today = True
-
-    if is_new_session_for_today:
-        current_history = []  # Start fresh
-        session_marker = {
-            "role": "system",
-            "content": Constant.system_new_session.format(
-                timestamp=time.strftime("%Y-%m-%d %H:%M:%S")
-            ),
-        }
-        current_history.append(session_marker)
-
     try:
-        cleaned_message_content = message.strip()
-        cleaned_message_content = " ".join(cleaned_message_content.split())
-
-        formatted_new_message = {"role": role, "content": cleaned_message_content}
-        current_history.append(formatted_new_message)
-
-        trimmed_history = []
-        if current_history:
-            if (
-                isinstance(current_history[0], dict)
-                and current_history[0].get("role") == "system"
-            ):
-                trimmed_history.append(current_history[0])
-                chat_messages = current_history[1:]  # Actual chat messages
-                trimmed_history.extend(chat_messages[-max_messages:])
-            else:
-                trimmed_history = current_history[-max_messages:]
-
-        with open(file_path, "w", encoding="utf-8") as file:
-            json.dump(trimmed_history, file, indent=4)
-            # print(f"Chat history successfully saved to '{file_path}'")
+        cleaned_message_content = " ".join(message.split())
+        lines = [json.dumps({"role": role, "content": cleaned_message_content})]
+
+        if not os.path.exists(file_path):
+            _record_counts[file_path] = 0
+        elif file_path not in _record_counts:
+            _record_counts[file_path] = len(load_session_history(file_path))
+        if _record_counts[file_path] == 0:  # New or empty file, open the session
+            lines.insert(0, json.dumps(_new_session_marker()))
+
+        with open(file_path, "a", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+        _record_counts[file_path] += len(lines)
+
+        if _record_counts[file_path] > 2 * max_messages + 1:
+            _record_counts[file_path] = _compact_session(file_path, max_messages)
 
     except OSError as e:
-        print(f"[ERROR] Failed to read/write file '{file_path}': {e}")
+        logger.error("Failed to read/write file '%s': %s", file_path, e)
     except TypeError as e:
-        print(f"[ERROR] JSON serialization error: {e}")
-        print(
+        logger.error("JSON serialization error: %s", e)
+        logger.error(
             "Not saving chat history due to serialization error. Please check message structure."
         )
 
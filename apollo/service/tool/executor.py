@@ -8,8 +8,204 @@ Author: Alberto Barrago
 License: BSD 3-Clause License - 2025
 """
 
+import asyncio
 import inspect
-from typing import Any, Dict, Callable
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Callable, NamedTuple, Tuple
+
+from apollo.config.instructions import get_available_tools
+from apollo.tools.search import SEARCH_CACHE_TTL_SECONDS, clear_search_caches
+
+try:  # Optional, faster JSON codec for tool arguments and results
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+# Tools that change the workspace: they invalidate cached search results and
+# must not run concurrently with other tool calls.
+MUTATING_TOOLS = frozenset({"create_file", "edit_file", "delete_file", "remove_dir"})
+
+# Side-effect-free workspace tools whose results are reused until the next change,
+# or until _RESULT_CACHE_TTL_SECONDS pass (the files may be edited outside the agent).
+CACHEABLE_TOOLS = frozenset(
+    {"list_dir", "file_search", "grep_search", "codebase_search"}
+)
+_RESULT_CACHE_MAX_ENTRIES = 256
+# Arguments that describe a call without affecting its result.
+_NON_SEMANTIC_ARGS = frozenset({"explanation"})
+_RESULT_CACHE_TTL_SECONDS = SEARCH_CACHE_TTL_SECONDS
+
+
+# Required arguments declared by each tool schema, read once at import.
+_SCHEMA_REQUIRED_ARGS: Dict[str, frozenset] = {
+    tool["function"]["name"]: frozenset(
+        tool["function"].get("parameters", {}).get("required", ())
+    )
+    for tool in get_available_tools()
+}
+
+
+class _ToolSpec(NamedTuple):
+    """What execute_tool needs to know about a registered tool function."""
+
+    is_async: bool
+    accepts_agent: bool
+    required_args: frozenset
+    valid_args: frozenset
+
+
+def _tool_spec(name: str, func: Callable) -> _ToolSpec:
+    """
+    Inspect a tool function once, when it is registered.
+
+    Schema-required arguments the function does not take (e.g. an 'explanation'
+    the search tools ignore) are filtered out before the call anyway, so they
+    are not enforced.
+
+    Args:
+        name: The tool name.
+        func: The function registered for the tool.
+
+    Returns:
+        The tool's dispatch information.
+    """
+    params = inspect.signature(func).parameters
+    code = func.__code__
+    return _ToolSpec(
+        is_async=inspect.iscoroutinefunction(func),
+        accepts_agent="agent" in params,
+        required_args=_SCHEMA_REQUIRED_ARGS.get(name, frozenset()) & params.keys(),
+        valid_args=frozenset(code.co_varnames[: code.co_argcount]),
+    )
+
+
+def _canonical_args(func_name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normalize the arguments of a read-only tool call for its result-cache key,
+    so equivalent spellings ('src', './src', 'src/') share one entry.
+
+    Arguments in _NON_SEMANTIC_ARGS, such as the free-text explanation, do not
+    change the result and are left out.
+
+    Only the key is normalized; the tool still receives the original arguments.
+
+    Args:
+        func_name: The tool name.
+        args: The arguments the tool will be called with.
+
+    Returns:
+        The arguments to build the cache key from.
+    """
+    args = {
+        name: value for name, value in args.items() if name not in _NON_SEMANTIC_ARGS
+    }
+    if func_name == "list_dir" and isinstance(args.get("target_file"), str):
+        return {**args, "target_file": os.path.normpath(args["target_file"])}
+    if func_name == "codebase_search" and isinstance(args.get("query"), str):
+        # The search splits the query into keywords, so spacing is irrelevant
+        return {**args, "query": " ".join(args["query"].split())}
+    return args
+
+
+def _with_call_explanation(result: Any, args: Dict[str, Any]) -> Any:
+    """
+    Return a cached result carrying the explanation of the current call.
+
+    Tools such as list_dir echo their explanation argument back; since it is
+    left out of the cache key, a reused result would otherwise show the
+    explanation of the call that produced it.
+
+    Args:
+        result: The cached tool result.
+        args: The arguments of the current call.
+
+    Returns:
+        The result, with its 'explanation' field replaced when it has one.
+    """
+    if isinstance(result, dict) and "explanation" in result:
+        return {**result, "explanation": args.get("explanation")}
+    return result
+
+
+def _to_plain(result: Any) -> Any:
+    """
+    Convert NamedTuple records (e.g. SearchResult) in a tool result into dicts,
+    so the LLM keeps seeing field names instead of positional tuples.
+
+    Args:
+        result: The raw result returned by a tool function.
+
+    Returns:
+        The result with any NamedTuple items converted to dictionaries.
+    """
+    if isinstance(result, list):
+        return [
+            (
+                item._asdict()
+                if isinstance(item, tuple) and hasattr(item, "_asdict")
+                else item
+            )
+            for item in result
+        ]
+    return result
+
+
+def tool_call_field(obj: Any, key: str, default: Any = None) -> Any:
+    """
+    Read a field of a tool call, or of its function, given as a dict or an Ollama object.
+
+    Args:
+        obj: The tool call or its 'function' entry.
+        key: The field to read, e.g. 'function', 'name', 'arguments' or 'id'.
+        default: The value returned when the field is missing.
+
+    Returns:
+        The field value, or default.
+    """
+    if isinstance(obj, dict):
+        return obj.get(key, default)
+    return getattr(obj, key, default)
+
+
+def _json_loads(text: str | bytes) -> Any:
+    """Parse JSON tool arguments, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def serialize_tool_result(result: Any) -> str:
+    """
+    Render a tool result as the content of a tool message for the LLM.
+
+    Strings are passed through; structured results become compact JSON,
+    which is cheaper to produce than the repr of nested dicts and lists
+    and easier for the model to read.
+
+    Args:
+        result: The value returned by execute_tool.
+
+    Returns:
+        The text to send as the tool message content.
+    """
+    if isinstance(result, str):
+        return result
+    if isinstance(result, (dict, list, tuple)):
+        try:
+            if orjson is not None:
+                return orjson.dumps(
+                    result, default=str, option=orjson.OPT_NON_STR_KEYS
+                ).decode()
+            return json.dumps(
+                result, ensure_ascii=False, separators=(",", ":"), default=str
+            )
+        except (TypeError, ValueError):  # e.g. non-string keys
+            pass
+    return str(result)
 
 
 class ToolExecutor:
@@ -27,9 +223,29 @@ class ToolExecutor:
             workspace_path: The root path of the workspace to operate on.
         """
         self.workspace_path = workspace_path
+        self._abs_workspace_source = None
+        self._abs_workspace_path = None
         self.available_functions = {}
+        self._tool_specs: Dict[str, _ToolSpec] = {}
         self.last_edit_file = None
         self.last_edit_content = None
+        # {(tool name, canonical arguments): (monotonic time stored, result)}
+        self._result_cache: "OrderedDict[tuple, Tuple[float, Any]]" = OrderedDict()
+
+    @property
+    def abs_workspace_path(self) -> str:
+        """
+        The absolute workspace path, recomputed only when workspace_path changes.
+        """
+        if (
+            self._abs_workspace_path is None
+            or self._abs_workspace_source != self.workspace_path
+        ):
+            self._abs_workspace_source = self.workspace_path
+            self._abs_workspace_path = os.path.abspath(
+                self.workspace_path or os.getcwd()
+            )
+        return self._abs_workspace_path
 
     def register_function(self, name: str, func: Callable) -> None:
         """
@@ -39,7 +255,10 @@ class ToolExecutor:
             name: The name of the function.
             func: The function to register.
         """
+        # Interned keys let the lookup of an interned tool-call name match by identity
+        name = sys.intern(name)
         self.available_functions[name] = func
+        self._tool_specs[name] = _tool_spec(name, func)
 
     def register_functions(self, functions: Dict[str, Callable]) -> None:
         """
@@ -48,7 +267,8 @@ class ToolExecutor:
         Args:
             functions: A dictionary mapping function names to functions.
         """
-        self.available_functions.update(functions)
+        for name, func in functions.items():
+            self.register_function(name, func)
 
     async def execute_tool(self, tool_call) -> Any:
         """
@@ -60,58 +280,80 @@ class ToolExecutor:
         Returns:
             The result of the tool execution.
         """
+        function = tool_call_field(tool_call, "function")
+        if function is None:
+            return "[ERROR] Invalid tool_call format or missing 'function'."
+        func_name = tool_call_field(function, "name")
+        raw_args = tool_call_field(function, "arguments", {})
 
-        def filter_valid_args(valid_func, args_dict):
-            valid_params = valid_func.__code__.co_varnames[
-                : valid_func.__code__.co_argcount
-            ]
-            return {k: v for k, v in args_dict.items() if k in valid_params}
+        if not func_name:
+            return "[ERROR] Function name not provided in tool call."
+        if isinstance(func_name, str):
+            func_name = sys.intern(func_name)
 
-        try:
-            if hasattr(tool_call, "function"):
-                func_name = getattr(tool_call.function, "name", None)
-                raw_args = getattr(tool_call.function, "arguments", {})
-            elif isinstance(tool_call, dict) and "function" in tool_call:
-                func_name = tool_call["function"].get("name")
-                raw_args = tool_call["function"].get("arguments", {})
-            else:
-                return "[ERROR] Invalid tool_call format or missing 'function'."
-
-            if not func_name:
-                return "[ERROR] Function name not provided in tool call."
-
-            if isinstance(raw_args, str):
-                arguments_dict = __import__("json").loads(raw_args)
-            elif isinstance(raw_args, dict):
-                arguments_dict = raw_args
-            else:
-                return f"[ERROR] Unsupported arguments type: {type(raw_args)}"
-        except RuntimeError as e:
-            return f"[ERROR] Failed to parse tool call: {e}"
+        arguments_dict = raw_args
+        if isinstance(raw_args, str):
+            try:
+                arguments_dict = _json_loads(raw_args)
+            except ValueError as e:  # json and orjson decode errors
+                return f"[ERROR] Failed to parse tool call: {e}"
+        if not isinstance(arguments_dict, dict):
+            return f"[ERROR] Unsupported arguments type: {type(arguments_dict)}"
 
         func = self.available_functions.get(func_name)
         if not func:
             return f"[ERROR] Function '{func_name}' not found."
 
-        filtered_args = filter_valid_args(func, arguments_dict)
+        spec = self._tool_specs[func_name]
+        missing_args = spec.required_args.difference(arguments_dict)
+        if missing_args:
+            return (
+                f"[ERROR] Missing required arguments for '{func_name}': "
+                f"{', '.join(sorted(missing_args))}"
+            )
 
-        sig = inspect.signature(func)
-        params = sig.parameters
+        filtered_args = {
+            k: v for k, v in arguments_dict.items() if k in spec.valid_args
+        }
 
         args_to_pass = filtered_args.copy()
 
-        if (
-            "agent" in params
-        ):  # Check if the tool function explicitly accepts an 'agent' parameter
+        if spec.accepts_agent:
             # If the tool function expects 'agent', pass the ToolExecutor instance itself.
             # This makes the ToolExecutor the "agent" for the tool.
             args_to_pass["agent"] = self
 
+        cache_key = None
+        if func_name in CACHEABLE_TOOLS:
+            cache_key = (
+                func_name,
+                json.dumps(
+                    _canonical_args(func_name, filtered_args),
+                    sort_keys=True,
+                    default=str,
+                ),
+            )
+            cached = self._result_cache.get(cache_key)
+            if cached is not None:
+                if time.monotonic() - cached[0] < _RESULT_CACHE_TTL_SECONDS:
+                    self._result_cache.move_to_end(cache_key)
+                    return _with_call_explanation(cached[1], filtered_args)
+                del self._result_cache[cache_key]
+
         try:
-            if inspect.iscoroutinefunction(func):
+            if spec.is_async:
                 result = await func(**args_to_pass)
             else:
-                result = func(**args_to_pass)
+                # Blocking tools run in a worker thread so the event loop keeps going
+                result = await asyncio.to_thread(func, **args_to_pass)
+            if func_name in MUTATING_TOOLS:
+                clear_search_caches()
+                self._result_cache.clear()
+            result = _to_plain(result)
+            if cache_key and not (isinstance(result, dict) and result.get("error")):
+                self._result_cache[cache_key] = (time.monotonic(), result)
+                if len(self._result_cache) > _RESULT_CACHE_MAX_ENTRIES:
+                    self._result_cache.popitem(last=False)
             return result
         except RuntimeError as e:
             return f"[ERROR] Failed to execute tool: {e}"
@@ -6,14 +6,185 @@ Author: Alberto Barrago
 License: BSD 3-Clause License - 2025
 """
 
+import asyncio
+import hashlib
+import json
+import logging
+import re
 import uuid
-from typing import Any
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable
+import httpx
 import ollama
 
 from apollo.config.instructions import get_available_tools
 from apollo.config.const import Constant
 from apollo.service.tool.format import format_duration_ns
 from apollo.service.session import save_user_history_to_json
+from apollo.service.tool.executor import (
+    MUTATING_TOOLS,
+    serialize_tool_result,
+    tool_call_field,
+)
+
+logger = logging.getLogger(__name__)
+
+# chat_terminal wraps the user's words as "... The command is: $<input>"
+_COMMAND_RE = re.compile(r"The command is: \$(.*)\Z", re.DOTALL)
+# Words hinting that a request needs the workspace or web tools
+_TOOL_INTENT_RE = re.compile(
+    r"\b(?:file|dir|folder|path|search|find|grep|creat|edit|delet|remov|writ|read"
+    r"|list|code|function|class|bug|fix|web|wiki|project|workspace)\w*",
+    re.IGNORECASE,
+)
+_CHAT_ONLY_MAX_WORDS = 12
+# Once a history limit is exceeded, trim down to this fraction of it, so the
+# prompt prefix (and Ollama's KV cache for it) stays stable for several rounds
+_TRIM_LOW_WATER = 0.75
+# The tool schema validated into ollama.Tool models once: the client re-validates
+# the tools of every chat request, which is a no-op for existing models
+_OLLAMA_TOOLS = [ollama.Tool.model_validate(tool) for tool in get_available_tools()]
+_TOOL_NAMES = frozenset(tool["function"]["name"] for tool in get_available_tools())
+
+
+def _is_chat_only(text: str) -> bool:
+    """
+    Guess whether a request is plain conversation that needs no tools.
+
+    Args:
+        text: The request passed to handle_request.
+
+    Returns:
+        True for short messages without any tool-related wording.
+    """
+    match = _COMMAND_RE.search(text)
+    command = match.group(1) if match else text
+    return (
+        len(command.split()) <= _CHAT_ONLY_MAX_WORDS
+        and _TOOL_INTENT_RE.search(command) is None
+    )
+
+
+def _tool_call_name(tool_call) -> str:
+    """
+    Return the function name of a tool call given as a dict or an Ollama object.
+
+    Args:
+        tool_call: A tool call from the LLM.
+
+    Returns:
+        The function name, or "unknown" if it cannot be determined.
+    """
+    function = tool_call_field(tool_call, "function")
+    if function is None:
+        return "unknown"
+    return tool_call_field(function, "name", "unknown")
+
+
+def _is_replayable_tool_call(tool_call) -> bool:
+    """
+    Check that a tool call names a known read-only tool with object arguments.
+
+    Args:
+        tool_call: A tool call from the LLM.
+
+    Returns:
+        False for workspace-changing, unknown or malformed calls.
+    """
+    name = _tool_call_name(tool_call)
+    if name not in _TOOL_NAMES or name in MUTATING_TOOLS:
+        return False
+    arguments = tool_call_field(tool_call_field(tool_call, "function"), "arguments")
+    if isinstance(arguments, str):
+        try:
+            arguments = json.loads(arguments)
+        except ValueError:
+            return False
+    return isinstance(arguments, dict)
+
+
+def _tool_call_id(tool_call) -> str:
+    """Return the id of a tool call given as a dict or an Ollama object."""
+    return tool_call_field(tool_call, "id", "N/A")
+
+
+def _tool_call_key(tool_call) -> str:
+    """
+    Build a canonical key of a tool call's name and arguments.
+
+    Args:
+        tool_call: A tool call from the LLM.
+
+    Returns:
+        A JSON string that is equal for calls with the same name and arguments.
+    """
+    function = tool_call_field(tool_call, "function")
+    if function is None:
+        return f"unkeyed:{id(tool_call)}"
+    name = tool_call_field(function, "name")
+    arguments = tool_call_field(function, "arguments")
+    if isinstance(arguments, str):
+        try:
+            arguments = json.loads(arguments)
+        except ValueError:
+            pass
+    return json.dumps([name, arguments], sort_keys=True, default=_json_default)
+
+
+def _json_default(value: Any) -> Any:
+    """Serialize Ollama message/tool-call objects when hashing the chat history."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return str(value)
+
+
+async def _replay_response(message) -> AsyncIterator[dict]:
+    """Yield a cached LLM message as a single, final stream chunk."""
+    yield {"message": message, "done": True, "total_duration": 0}
+
+
+def _plain_message(message) -> Any:
+    """
+    Convert an Ollama Message object into the plain dict kept in the history.
+
+    Plain dicts are what the client and the cache-key hashing serialize
+    cheapest on every following turn; dicts are returned unchanged.
+    """
+    if hasattr(message, "model_dump"):
+        return message.model_dump(exclude_none=True)
+    return message
+
+
+def _extract(message) -> tuple:
+    """
+    Return the tool calls and content of a message given as a dict or an Ollama object.
+
+    Args:
+        message: A chat message from the LLM or the history.
+
+    Returns:
+        A tuple of (tool_calls, content), each None when absent.
+    """
+    if isinstance(message, dict):
+        return message.get("tool_calls"), message.get("content")
+    return getattr(message, "tool_calls", None), getattr(message, "content", None)
+
+
+def _estimate_tokens(message) -> int:
+    """
+    Roughly estimate the prompt tokens of a chat message (~4 characters per token).
+
+    Args:
+        message: A chat message, either a dict or an Ollama Message object.
+
+    Returns:
+        The estimated token count, including a small per-message overhead.
+    """
+    tool_calls, content = _extract(message)
+    size = len(content) if isinstance(content, str) else 0
+    if tool_calls:
+        size += len(str(tool_calls))
+    return size // 4 + 4
 
 
 class ApolloCore:
@@ -31,9 +202,23 @@ class ApolloCore:
         self.session_id: str | None = None
         self.permanent_history: list[dict] = []
         self.chat_history: list[dict] = []
+        self._history_tokens: int = 0
         self._chat_in_progress: bool = False
         self.tool_executor = None
-        self.ollama_client = ollama.AsyncClient(host=Constant.ollama_host)
+        # Optional callback receiving assistant content as it streams in
+        self.on_token: Callable[[str], None] | None = None
+        # Model answering the current request, see handle_request
+        self._turn_model: str = Constant.llm_model
+        # LLM answers keyed by a hash of the model and the history that produced them
+        self._llm_cache: OrderedDict[bytes, Any] = OrderedDict()
+        # Last pending write of the session file, see persist_message
+        self._persist_task: asyncio.Task | None = None
+        # One pooled HTTP client for the whole session, keeping the connection alive
+        self.ollama_client = ollama.AsyncClient(
+            host=Constant.ollama_host,
+            timeout=httpx.Timeout(Constant.ollama_timeout_seconds, connect=5.0),
+            limits=httpx.Limits(max_keepalive_connections=8, max_connections=16),
+        )
 
     async def process_llm_response(
         self, llm_response
@@ -50,23 +235,19 @@ class ApolloCore:
         message = llm_response.get("message")
         total_duration = llm_response.get("total_duration", 0)
         if not message:
-            print("[WARNING] LLM response missing 'message' field.")
-            self.chat_history.append(
-                {
-                    "role": "assistant",
-                    "content": "[Error: Empty message received from LLM]",
-                }
+            logger.warning("LLM response missing 'message' field.")
+            self._append_to_history(
+                [
+                    {
+                        "role": "assistant",
+                        "content": "[Error: Empty message received from LLM]",
+                    }
+                ]
             )
             return None, None, None, None
 
-        if isinstance(message, dict):
-            tool_calls = message.get("tool_calls")
-            content = message.get("content")
-        else:
-            tool_calls = getattr(message, "tool_calls", None)
-            content = getattr(message, "content", None)
-
-        self.chat_history.append(message)
+        tool_calls, content = _extract(message)
+        self._append_to_history([message])
         return message, tool_calls, content, total_duration
 
     async def _handle_tool_calls(self, tool_calls, iterations, recent_tool_calls):
@@ -85,67 +266,201 @@ class ApolloCore:
             and current_tool_calls is a list of function names.
         """
         if not isinstance(tool_calls, list):
-            print(
-                f"[ERROR] Received non-list 'tool_calls' from LLM Message. "
-                f"Type: {type(tool_calls)}. Value: {tool_calls}"
+            logger.error(
+                "Received non-list 'tool_calls' from LLM Message. Type: %s. Value: %s",
+                type(tool_calls),
+                tool_calls,
             )
             return {
                 "error": f"Received unexpected tool_calls format from LLM: {tool_calls}"
             }, None
 
-        current_tool_calls = []
-        for tool_call in tool_calls:
-            if hasattr(tool_call, "function"):
-                func_name = getattr(tool_call.function, "name", "unknown")
-            elif isinstance(tool_call, dict) and "function" in tool_call:
-                func_name = tool_call["function"].get("name", "unknown")
-            else:
-                func_name = "unknown"
-            current_tool_calls.append(func_name)
+        current_tool_calls = [_tool_call_name(tool_call) for tool_call in tool_calls]
 
         if (
             iterations > Constant.max_chat_iterations
             and current_tool_calls == recent_tool_calls
         ):
-            print("[WARNING] Detected repeated tool call pattern, breaking loop")
+            logger.warning("Detected repeated tool call pattern, breaking loop")
             loop_detected_msg = Constant.error_loop_detected
             self.permanent_history.append(
                 {"role": "assistant", "content": loop_detected_msg}
             )
             return {"response": loop_detected_msg}, current_tool_calls
 
-        tool_outputs = []
-        for tool_call in tool_calls:
-            try:
-                tool_result = await self._execute_tool(tool_call)
+        tool_results = await self._execute_tool_calls(tool_calls, current_tool_calls)
 
-            except RuntimeError as e:
-                tool_result = f"[ERROR] Exception during tool execution: {str(e)}"
-
-            tool_outputs.append(
+        self._append_to_history(
+            [
                 {
                     "role": "tool",
-                    "tool_call_id": getattr(
-                        tool_call, "id", tool_call.get("id", "N/A")
-                    ),
-                    "content": str(tool_result),
+                    "tool_call_id": _tool_call_id(tool_call),
+                    "content": serialize_tool_result(tool_result),
                 }
-            )
-
-        self.chat_history.extend(tool_outputs)
+                for tool_call, tool_result in zip(tool_calls, tool_results)
+            ]
+        )
         return None, current_tool_calls
 
+    async def _execute_tool_calls(self, tool_calls: list, func_names: list) -> list:
+        """
+        Execute a batch of tool calls, overlapping the read-only ones.
+
+        Consecutive read-only calls run concurrently; a workspace-changing
+        call waits for them and runs alone, so edits keep their order.
+
+        Args:
+            tool_calls: The tool calls from the LLM.
+            func_names: The function name of each tool call.
+
+        Returns:
+            The tool results, in the same order as tool_calls.
+        """
+        results = []
+        pending_reads = []
+        for tool_call, func_name in zip(tool_calls, func_names):
+            if func_name not in MUTATING_TOOLS:
+                pending_reads.append(tool_call)
+                continue
+            if pending_reads:
+                results.extend(await self._gather_tool_calls(pending_reads))
+                pending_reads = []
+            results.extend(await self._gather_tool_calls([tool_call]))
+
+        if pending_reads:
+            results.extend(await self._gather_tool_calls(pending_reads))
+        return results
+
+    async def _gather_tool_calls(self, tool_calls: list) -> list:
+        """
+        Run tool calls concurrently; a failing call does not affect its siblings.
+
+        Calls with the same name and arguments are executed once and share
+        the result.
+
+        Args:
+            tool_calls: The tool calls to run together.
+
+        Returns:
+            The tool results in order, with exceptions turned into error strings.
+        """
+        unique_calls = []
+        index_by_key = {}
+        result_indexes = []
+        for tool_call in tool_calls:
+            key = _tool_call_key(tool_call)
+            if key not in index_by_key:
+                index_by_key[key] = len(unique_calls)
+                unique_calls.append(tool_call)
+            result_indexes.append(index_by_key[key])
+
+        results = await asyncio.gather(
+            *map(self._execute_tool, unique_calls), return_exceptions=True
+        )
+        for index, result in enumerate(results):
+            if isinstance(result, Exception):
+                results[index] = f"[ERROR] Exception during tool execution: {result}"
+            elif isinstance(result, BaseException):  # e.g. cancellation
+                raise result
+        return [results[index] for index in result_indexes]
+
+    def _append_to_history(self, messages: list) -> None:
+        """
+        Append messages to the chat history, keeping it within the token budget.
+
+        Args:
+            messages: The messages to append.
+        """
+        self.chat_history.extend(messages)
+        self._history_tokens += sum(map(_estimate_tokens, messages))
+        self._trim_history()
+
+    def _trim_history(self) -> None:
+        """
+        Drop the oldest messages once the history exceeds Constant.max_history_tokens
+        or holds more than Constant.max_llm_history_messages messages.
+
+        Trimming goes down to _TRIM_LOW_WATER of the limits rather than just below
+        them, so the following rounds send an unchanged prefix that Ollama can
+        answer from its prompt cache. The latest message is always kept, and tool
+        results are never left at the start of the history without the assistant
+        message that requested them.
+        """
+        if (
+            self._history_tokens <= Constant.max_history_tokens
+            and len(self.chat_history) <= Constant.max_llm_history_messages
+        ):
+            return
+
+        token_target = int(Constant.max_history_tokens * _TRIM_LOW_WATER)
+        message_target = int(Constant.max_llm_history_messages * _TRIM_LOW_WATER)
+        drop = 0
+        last = len(self.chat_history) - 1
+        while drop < last and (
+            self._history_tokens > token_target
+            or len(self.chat_history) - drop > message_target
+            or self.chat_history[drop].get("role") == "tool"
+        ):
+            self._history_tokens -= _estimate_tokens(self.chat_history[drop])
+            drop += 1
+        del self.chat_history[:drop]
+        logger.debug(
+            "Trimmed %d old messages, %d left (~%d tokens)",
+            drop,
+            len(self.chat_history),
+            self._history_tokens,
+        )
+
+    def _llm_cache_key(self) -> bytes:
+        """Hash the model name and the current chat history into a cache key."""
+        payload = json.dumps(
+            [self._turn_model, self.chat_history],
+            sort_keys=True,
+            default=_json_default,
+        )
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).digest()
+
+    def _store_llm_response(self, key: bytes, message) -> None:
+        """
+        Cache an LLM message if replaying it is both safe and useful.
+
+        Only answers with content and well-formed read-only tool calls are
+        cached. Replaying a workspace-changing call would repeat its side
+        effect. Empty replies and malformed calls add nothing to the history,
+        so a retry of the same prompt would hit them again instead of asking
+        the LLM.
+
+        Args:
+            key: The cache key of the history that produced the message.
+            message: The complete assistant message.
+        """
+        if Constant.llm_cache_max_entries <= 0:
+            return
+        tool_calls = message.get("tool_calls")
+        if tool_calls:
+            if not isinstance(tool_calls, list) or not all(
+                map(_is_replayable_tool_call, tool_calls)
+            ):
+                return
+        elif not str(message.get("content") or "").strip():
+            return
+        self._llm_cache[key] = message
+        self._llm_cache.move_to_end(key)
+        if len(self._llm_cache) > Constant.llm_cache_max_entries:
+            self._llm_cache.popitem(last=False)
+
     async def _get_llm_response_from_ollama(self):
         """
         Fetches the LLM response from Ollama, adding a system message if needed.
         """
 
         llm_response_stream = await self.ollama_client.chat(
-            model=Constant.llm_model,
+            model=self._turn_model,
             messages=self.chat_history,
-            tools=get_available_tools(),
+            tools=_OLLAMA_TOOLS,
             stream=True,
             options={},
+            keep_alive=Constant.ollama_keep_alive,
         )
 
         return llm_response_stream
@@ -163,10 +478,16 @@ class ApolloCore:
             Response from the chat model or error information.
         """
         if self._chat_in_progress:
-            print("[WARNING] Chat already in progress, ignoring concurrent request")
+            logger.warning("Chat already in progress, ignoring concurrent request")
             return {"error": Constant.error_chat_in_progress}
 
         self._chat_in_progress = True
+        # Conversational requests may go to a smaller model when one is configured
+        self._turn_model = (
+            Constant.chat_llm_model
+            if Constant.chat_llm_model and _is_chat_only(text)
+            else Constant.llm_model
+        )
 
         try:
             self._initialize_chat_session(text)  # Init session and update chat history
@@ -178,11 +499,11 @@ class ApolloCore:
 
         except RuntimeError as e:
             error_message = f"[ERROR] RuntimeError during chat processing: {e}"
-            print(error_message)
+            logger.error("RuntimeError during chat processing: %s", e)
             return {"error": error_message}
         except IOError as e:
             error_message = f"[ERROR] An unexpected error occurred: {str(e)}"
-            print(error_message)
+            logger.error("An unexpected error occurred: %s", e)
             return {"error": error_message}
         finally:
             self._chat_in_progress = False
@@ -194,12 +515,18 @@ class ApolloCore:
         """
 
         while iterations < Constant.max_chat_iterations:
-            try:
-                llm_response_stream = await self._get_llm_response_from_ollama()
-            except RuntimeError as e:
-                return {
-                    "error": f"Failed to get response from language model: {str(e)}"
-                }
+            cache_key = self._llm_cache_key()
+            cached_message = self._llm_cache.get(cache_key)
+            if cached_message is not None:
+                self._llm_cache.move_to_end(cache_key)
+                llm_response_stream = _replay_response(cached_message)
+            else:
+                try:
+                    llm_response_stream = await self._get_llm_response_from_ollama()
+                except RuntimeError as e:
+                    return {
+                        "error": f"Failed to get response from language model: {str(e)}"
+                    }
 
             full_response_message = {
                 "role": "assistant",
@@ -219,6 +546,8 @@ class ApolloCore:
 
                 if chunk_content:
                     accumulated_content += chunk_content
+                    if self.on_token:
+                        self.on_token(chunk_content)
 
                 if chunk_tool_calls:
                     if final_tool_calls is None:
@@ -235,6 +564,9 @@ class ApolloCore:
                 full_response_message["content"] = accumulated_content
             if final_tool_calls and not full_response_message.get("tool_calls"):
                 full_response_message["tool_calls"] = final_tool_calls
+            full_response_message = _plain_message(full_response_message)
+            if cached_message is None:
+                self._store_llm_response(cache_key, full_response_message)
 
             simulated_llm_response_for_processing = {
                 "message": full_response_message,
@@ -244,36 +576,42 @@ class ApolloCore:
             (message_obj, tool_calls, content, duration_val) = (
                 await self.process_llm_response(simulated_llm_response_for_processing)
             )
-            duration_str = format_duration_ns(duration_val)
-
             if message_obj and message_obj.get("role"):
-                save_user_history_to_json(
-                    message=message_obj.get("content"), role=message_obj.get("role")
+                self.persist_message(
+                    message_obj.get("content"), message_obj.get("role")
                 )
             elif content:
-                save_user_history_to_json(message=content, role="assistant")
+                self.persist_message(content, "assistant")
 
             if message_obj is None:
                 return {"response": Constant.error_empty_llm_message}
 
-            if content and not tool_calls:
-                self.permanent_history.append({"role": "assistant", "content": content})
-                return {"response": f"[{duration_str}] {content}"}
+            if not tool_calls:
+                # Plain reply: the common case, answered without any tool handling
+                duration_str = format_duration_ns(duration_val)
+                if content:
+                    self.permanent_history.append(
+                        {"role": "assistant", "content": content}
+                    )
+                    return {"response": f"[{duration_str}] {content}"}
+                return {
+                    "response": f"[{duration_str}] No content or tools were provided in the response."
+                }
 
-            if tool_calls:
-                result, current_tool_calls = await self._handle_tool_calls(
-                    tool_calls, iterations, recent_tool_calls
+            result, current_tool_calls = await self._handle_tool_calls(
+                tool_calls, iterations, recent_tool_calls
+            )
+            if result:
+                return result
+            recent_tool_calls = current_tool_calls
+            iterations += 1
+            # Tool results are interpreted by the full model
+            self._turn_model = Constant.llm_model
+            if iterations == Constant.max_chat_iterations - 1:
+                # Last round: nudge the model to answer instead of calling more tools
+                self._append_to_history(
+                    [{"role": "system", "content": Constant.system_conclude_soon}]
                 )
-                # print(f"\n[{duration_str}], Tools used: {current_tool_calls}\n") # Already printed
-                if result:
-                    return result
-                recent_tool_calls = current_tool_calls
-                iterations += 1
-                continue
-
-            return {
-                "response": f"[{duration_str}] No content or tools were provided in the response."
-            }
 
         timeout_message = Constant.error_max_iterations.format(
             max_iterations=Constant.max_chat_iterations
@@ -291,6 +629,42 @@ class ApolloCore:
         except RuntimeError as e:
             return f"[ERROR] Exception during tool execution: {str(e)}"
 
+    def persist_message(self, message: str, role: str) -> None:
+        """
+        Save a message to the session file in a background thread.
+
+        Each write waits for the previous one, so the file keeps the order of
+        the conversation while the chat loop goes on without it.
+
+        Args:
+            message: The content of the message to save.
+            role: The role of the sender of the message.
+        """
+        previous = self._persist_task
+
+        async def _persist() -> None:
+            if previous is not None:
+                await previous
+            try:
+                await asyncio.to_thread(save_user_history_to_json, message, role)
+            except Exception:  # Saving must never break the chat loop
+                logger.exception("Failed to save the %s message to the session", role)
+
+        self._persist_task = asyncio.create_task(_persist())
+
+    async def aclose(self) -> None:
+        """Flush the pending history writes and close the Ollama client connections."""
+        if self._persist_task is not None:
+            await self._persist_task
+            self._persist_task = None
+        close = getattr(self.ollama_client, "close", None)
+        if close is not None:
+            await close()
+        else:
+            # ollama 0.4.x, the range pinned in requirements.txt, has no public
+            # close(); its pooled connections belong to the wrapped httpx client
+            await self.ollama_client._client.aclose()
+
     def set_tool_executor(self, tool_executor):
         """Associate this chat instance with a ToolExecutor instance."""
         self.tool_executor = tool_executor
@@ -299,7 +673,7 @@ class ApolloCore:
         """Initializes the session and updates chat history."""
         if not self.session_id:
             self.session_id = str(uuid.uuid4())
-            print(f"[INFO] New chat session: {self.session_id}")
+            logger.info("New chat session: %s", self.session_id)
 
         last_message = self.permanent_history[-1] if self.permanent_history else None
 
@@ -309,7 +683,14 @@ class ApolloCore:
             or last_message.get("content") != text
         ):
             self.permanent_history.append({"role": "user", "content": text})
-            self.chat_history = self.permanent_history.copy()
         else:
-            self.chat_history = self.permanent_history.copy()
-            print(f"Chat History {self.chat_history}")
+            logger.debug("Chat History %s", self.permanent_history)
+
+        # Only the tail of the permanent history can survive _trim_history, so
+        # copy just that window instead of the whole conversation every turn.
+        self.chat_history = self.permanent_history[
+            -(Constant.max_llm_history_messages + 1) :
+        ]
+
+        self._history_tokens = sum(map(_estimate_tokens, self.chat_history))
+        self._trim_history()
@@ -8,13 +8,64 @@ Author: Alberto Barrago
 License: BSD 3-Clause License - 2025
 """
 
+import asyncio
 import json
+import logging
 import mimetypes
 import os
 import re
+import shutil
+import tempfile
 from typing import Dict, Any, Tuple, Optional
 from bs4 import BeautifulSoup
 import aiofiles
+import aiofiles.os
+
+logger = logging.getLogger(__name__)
+
+
+def _workspace_root(agent) -> str:
+    """
+    Return the absolute workspace path of the agent.
+
+    Uses the value cached by ToolExecutor when available instead of
+    normalizing workspace_path again on every call.
+    """
+    cached = getattr(agent, "abs_workspace_path", None)
+    if isinstance(cached, str):
+        return cached
+    return os.path.abspath(getattr(agent, "workspace_path", os.getcwd()))
+
+
+def _is_within_workspace(absolute_path: str, workspace_root: str) -> bool:
+    """
+    Check that an absolute path is the workspace root or lies below it.
+
+    A plain startswith() would also accept siblings such as '/ws2' for '/ws'.
+    """
+    return absolute_path == workspace_root or absolute_path.startswith(
+        os.path.join(workspace_root, "")
+    )
+
+
+def _scan_dir(path: str) -> Tuple[list, list]:
+    """
+    Split the entries of a directory into subdirectories and files.
+
+    os.scandir reports the entry type with the listing, so most entries are
+    classified without an extra stat call.
+
+    Args:
+        path: The absolute path of the directory to list.
+
+    Returns:
+        A tuple of (directories, files) entry names.
+    """
+    directories, files = [], []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            (directories if entry.is_dir() else files).append(entry.name)
+    return directories, files
 
 
 async def list_dir(agent, target_file: str, explanation: str = None) -> Dict[str, Any]:
@@ -31,50 +82,39 @@ async def list_dir(agent, target_file: str, explanation: str = None) -> Dict[str
         Dictionary with directory contents information.
     """
 
-    target_path = os.path.join(agent.workspace_path, target_file)
-    absolute_target_path = os.path.abspath(target_path)
+    workspace_root = _workspace_root(agent)
+    absolute_target_path = os.path.abspath(os.path.join(workspace_root, target_file))
 
     # Security check: Ensure the path is within the workspace
-    if not absolute_target_path.startswith(os.path.abspath(agent.workspace_path)):
+    if not _is_within_workspace(absolute_target_path, workspace_root):
         error_msg = f"Attempted to list directory outside workspace: {target_file} (resolved to {absolute_target_path})"
-        print(f"[ERROR] {error_msg}")
+        logger.error(error_msg)
         return {"error": error_msg}
 
-    if not os.path.exists(absolute_target_path):
+    try:
+        directories, files = await asyncio.to_thread(_scan_dir, absolute_target_path)
+    except FileNotFoundError:
         error_msg = (
             f"Path does not exist: {target_file} (resolved to {absolute_target_path})"
         )
-        print(f"[ERROR] {error_msg}")
+        logger.error(error_msg)
         return {"error": error_msg}
-
-    if not os.path.isdir(absolute_target_path):
+    except NotADirectoryError:
         error_msg = f"Path is not a directory: {target_file} (resolved to {absolute_target_path})"
-        print(f"[ERROR] {error_msg}")
+        logger.error(error_msg)
         return {"error": error_msg}
-
-    try:
-        contents = os.listdir(absolute_target_path)
-        files = []
-        directories = []
-
-        for item in contents:
-            item_path = os.path.join(absolute_target_path, item)
-            if os.path.isdir(item_path):
-                directories.append(item)
-            else:
-                files.append(item)
-
-        return {
-            "path": target_file,
-            "explanation": explanation,
-            "directories": directories,
-            "files": files,
-        }
     except OSError as e:
         error_msg = f"Error listing directory {target_file}: {str(e)}"
-        print(f"[ERROR] {error_msg}")
+        logger.error(error_msg)
         return {"error": error_msg}
 
+    return {
+        "path": target_file,
+        "explanation": explanation,
+        "directories": directories,
+        "files": files,
+    }
+
 
 async def remove_dir(
     agent, target_file: str, explanation: str = None
@@ -86,25 +126,25 @@ async def remove_dir(
     :param explanation: Optional explanation for the removal.
     :return:
     """
-    target_path = os.path.join(agent.workspace_path, target_file)
-    absolute_target_path = os.path.abspath(target_path)
+    workspace_root = _workspace_root(agent)
+    absolute_target_path = os.path.abspath(os.path.join(workspace_root, target_file))
 
-    if not absolute_target_path.startswith(os.path.abspath(agent.workspace_path)):
+    if not _is_within_workspace(absolute_target_path, workspace_root):
         error_msg = f"Attempted to remove directory outside workspace: {target_file} (resolved to {absolute_target_path})"
-        print(f"[ERROR] {error_msg}")
+        logger.error(error_msg)
         return {"error": error_msg}
     if not os.path.exists(absolute_target_path):
         error_msg = (
             f"Path does not exist: {target_file} (resolved to {absolute_target_path})"
         )
-        print(f"[ERROR] {error_msg}")
+        logger.error(error_msg)
         return {"error": error_msg}
     if not os.path.isdir(absolute_target_path):
         error_msg = f"Path is not a directory: {target_file} (resolved to {absolute_target_path})"
-        print(f"[ERROR] {error_msg}")
+        logger.error(error_msg)
         return {"error": error_msg}
     try:
-        os.rmdir(absolute_target_path)
+        await aiofiles.os.rmdir(absolute_target_path)
         return {
             "success": True,
             "message": f"Directory removed: {target_file}",
@@ -112,7 +152,7 @@ async def remove_dir(
         }
     except OSError as e:
         error_msg = f"Failed to remove directory {target_file}: {str(e)}"
-        print(f"[ERROR] {error_msg}")
+        logger.error(error_msg)
         return {"success": False, "error": error_msg}
 
 
@@ -130,30 +170,30 @@ async def delete_file(
     Returns:
         Dictionary with success status and message or error.
     """
-    file_path = os.path.join(agent.workspace_path, target_file)
-    absolute_file_path = os.path.abspath(file_path)
+    workspace_root = _workspace_root(agent)
+    absolute_file_path = os.path.abspath(os.path.join(workspace_root, target_file))
 
-    if not absolute_file_path.startswith(os.path.abspath(agent.workspace_path)):
+    if not _is_within_workspace(absolute_file_path, workspace_root):
         error_msg = f"Attempted to delete file outside workspace: {target_file} (resolved to {absolute_file_path})"
-        print(f"[ERROR] {error_msg}")
+        logger.error(error_msg)
         return {"success": False, "error": error_msg}
 
     if not os.path.exists(absolute_file_path):
         error_msg = (
             f"File does not exist: {target_file} (resolved to {absolute_file_path})"
         )
-        print(f"[ERROR] {error_msg}")
+        logger.error(error_msg)
         return {"success": False, "error": error_msg}
 
     if not os.path.isfile(absolute_file_path):
         error_msg = (
             f"Path is not a file: {target_file} (resolved to {absolute_file_path})"
         )
-        print(f"[ERROR] {error_msg}")
+        logger.error(error_msg)
         return {"success": False, "error": error_msg}
 
     try:
-        os.remove(absolute_file_path)
+        await aiofiles.os.remove(absolute_file_path)
         return {
             "success": True,
             "message": f"File deleted: {target_file}",
@@ -161,7 +201,7 @@ async def delete_file(
         }
     except OSError as e:
         error_msg = f"Failed to delete file {target_file}: {str(e)}"
-        print(f"[ERROR] {error_msg}")
+        logger.error(error_msg)
         return {"success": False, "error": error_msg}
 
 
@@ -180,12 +220,10 @@ async def create_file(
         return {"success": False, "error": "Missing target file"}
 
     target_file = os.path.normpath(target_file).lstrip(os.sep)
-    workspace_path = getattr(agent, "workspace_path", os.getcwd())
-    absolute_workspace_path = os.path.abspath(workspace_path)
+    absolute_workspace_path = _workspace_root(agent)
     file_path = os.path.abspath(os.path.join(absolute_workspace_path, target_file))
 
-    print(f"[INFO] Operation: create_file, Target: {target_file}")
-    # print(f"[DEBUG] Raw instructions received: {instructions}") # For deeper debugging
+    logger.info("Operation: create_file, Target: %s", target_file)
 
     actual_instructions = instructions
     if isinstance(instructions, str):
@@ -193,8 +231,9 @@ async def create_file(
             actual_instructions = json.loads(instructions)
         except json.JSONDecodeError:
             # If it's a string but not valid JSON, it's an error for the 'instructions' object.
-            print(
-                f"[ERROR] Instructions parameter is a string but not valid JSON: '{instructions}'"
+            logger.error(
+                "Instructions parameter is a string but not valid JSON: '%s'",
+                instructions,
             )
             return {
                 "success": False,
@@ -202,22 +241,21 @@ async def create_file(
             }
 
     if not isinstance(actual_instructions, dict):
-        print(
-            f"[ERROR] Instructions parameter is not a dictionary after parsing: {type(actual_instructions)}"
+        logger.error(
+            "Instructions parameter is not a dictionary after parsing: %s",
+            type(actual_instructions),
         )
         return {
             "success": False,
             "error": "Instructions parameter must be a JSON object (dictionary).",
         }
 
-    # print(f"[DEBUG] Parsed instructions: {actual_instructions}") # For deeper debugging
-    # print(f"[INFO] Explanation: {explanation}")
-    # print(f"[INFO] Absolute workspace path: {absolute_workspace_path}")
-    # print(f"[INFO] Full file path: {file_path}")
+    if logger.isEnabledFor(logging.DEBUG):  # The instructions hold the whole file
+        logger.debug("Parsed instructions: %s", actual_instructions)
 
-    if not file_path.startswith(absolute_workspace_path):
+    if not _is_within_workspace(file_path, absolute_workspace_path):
         error_msg = f"Unsafe file path outside of workspace: {target_file} (resolved to {file_path})"
-        print(f"[ERROR] {error_msg}")
+        logger.error(error_msg)
         return {"success": False, "error": error_msg}
 
     # Ensure parent directory exists
@@ -225,14 +263,14 @@ async def create_file(
     if not os.path.exists(parent_dir):
         try:
             os.makedirs(parent_dir, exist_ok=True)
-            print(f"[INFO] Created parent directory: {parent_dir}")
+            logger.info("Created parent directory: %s", parent_dir)
         except OSError as e:
             error_msg = f"Failed to create parent directory {parent_dir} for {target_file}: {str(e)}"
-            print(f"[ERROR] {error_msg}")
+            logger.error(error_msg)
             return {"success": False, "error": error_msg}
     elif not os.path.isdir(parent_dir):
         error_msg = f"Cannot create file; parent path {parent_dir} exists but is not a directory."
-        print(f"[ERROR] {error_msg}")
+        logger.error(error_msg)
         return {"success": False, "error": error_msg}
 
     # --- Handle different instructions based on your tool's capabilities ---
@@ -255,8 +293,8 @@ async def create_file(
         # This is more complex and requires reading, modifying, then writing.
         # For now, let's return an error if this is the only instruction and content is not primary.
         # You would implement the read-modify-write logic here.
-        print(
-            f"[WARNING] 'insert_content_at_line' not fully implemented in this simplified example, requires read-modify-write."
+        logger.warning(
+            "'insert_content_at_line' not fully implemented in this simplified example, requires read-modify-write."
         )
         return {
             "success": False,
@@ -266,7 +304,7 @@ async def create_file(
     if file_exists and not overwrite and mode == "w" and content_to_write is not None:
         # If trying to write new content (mode 'w') to an existing file without overwrite flag
         error_msg = f"File '{target_file}' already exists and overwrite is not permitted by current instructions."
-        print(f"[ERROR] {error_msg}")
+        logger.error(error_msg)
         return {"success": False, "error": error_msg}
 
     if (
@@ -276,7 +314,7 @@ async def create_file(
     elif (
         content_to_write is None and mode == "a"
     ):  # If no content for 'a' mode, it's a no-op or error
-        print(f"[INFO] No content provided for append operation on file: {target_file}")
+        logger.info("No content provided for append operation on file: %s", target_file)
         return {
             "success": True,
             "message": f"File '{target_file}' touched (append with no content).",
@@ -287,7 +325,7 @@ async def create_file(
         async with aiofiles.open(file_path, mode, encoding="utf-8") as f:
             await f.write(str(content_to_write))  # Ensure content is string
 
-        print(f"[INFO] File {operation_description} successfully: {target_file}")
+        logger.info("File %s successfully: %s", operation_description, target_file)
         return {
             "success": True,
             "message": f"File '{target_file}' {operation_description} successfully.",
@@ -296,15 +334,19 @@ async def create_file(
         }
     except (OSError, IOError) as e:
         error_msg = f"Failed to write to file {target_file}: {str(e)}"
-        print(f"[ERROR] {error_msg}")
+        logger.error(error_msg)
         return {"success": False, "error": error_msg}
     except Exception as e:
         error_msg = f"Unexpected error during file operation on {target_file}: {str(e)}"
-        print(f"[ERROR] {error_msg}")
+        logger.error(error_msg)
         return {"success": False, "error": error_msg}
 
 
-async def _apply_edit(
+# Edit operations whose result does not depend on the current file content.
+_OPERATIONS_WITHOUT_ORIGINAL = frozenset({"replace_file_content"})
+
+
+def _apply_edit(
     target_file: str, original_content: str, instructions: Dict[str, Any]
 ) -> Tuple[str, Optional[str]]:
     """
@@ -500,7 +542,7 @@ async def _apply_edit(
     except re.error as e:
         return original_content, f"Regex error: {str(e)}"
     except Exception as e:  # Catch-all for unexpected issues within _apply_edit
-        print(f"[ERROR] Unexpected error in _apply_edit: {str(e)}")
+        logger.error("Unexpected error in _apply_edit: %s", e)
         return original_content, f"Unexpected error applying edit: {str(e)}"
 
     return (
@@ -509,82 +551,129 @@ async def _apply_edit(
     )
 
 
-async def edit_file(
-    agent, target_file: str, instructions: Dict[str, Any], explanation: str
-) -> Dict[str, Any]:
+def _write_file_atomic(file_path: str, content: str) -> None:
     """
-    Edit an existing file with the specified instructions
-    :param agent: The agent instance (could be ToolExecutor or ApolloAgent)
-    :param target_file: Path to the file to edit, relative to workspace
-    :param instructions: Edit instructions
-    :param explanation: Explanation for the edit
-    :return: Dictionary with success/error information
-    """
-    if not target_file:
-        return {"success": False, "error": "Missing target file"}
+    Replace the content of a file through a temporary sibling and os.replace.
 
-    target_file = os.path.normpath(target_file).lstrip(os.sep)
-    workspace_path = getattr(agent, "workspace_path", os.getcwd())
-    absolute_workspace_path = os.path.abspath(workspace_path)
-    file_path = os.path.abspath(os.path.join(absolute_workspace_path, target_file))
+    Readers see either the old or the new content, never a partial write,
+    and a failed write leaves the original file untouched.
+
+    Args:
+        file_path: The existing file to overwrite; symlinks are followed.
+        content: The new text content.
+    """
+    target_path = os.path.realpath(file_path)
+    directory, name = os.path.split(target_path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        shutil.copymode(target_path, tmp_path)  # mkstemp creates the file as 0600
+        os.replace(tmp_path, target_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _edit_file_sync(
+    file_path: str, target_file: str, instructions: Dict[str, Any]
+) -> Optional[str]:
+    """
+    Read a file, apply the edit instructions and write it back.
 
-    # print(f"[INFO] Operation: edit_file, Target: {target_file}")
-    # print(f"[DEBUG] Raw instructions received for edit: {instructions}")
-    # print(f"[INFO] Explanation: {explanation}")
+    Runs as a whole in a worker thread, so neither the file I/O nor the
+    edit itself (regex, HTML parsing) blocks the event loop.
 
-    if not file_path.startswith(absolute_workspace_path):
-        error_msg = f"Unsafe file path outside of workspace: {target_file} (resolved to {file_path})"
-        print(f"[ERROR] {error_msg}")
-        return {"success": False, "error": error_msg}
+    Args:
+        file_path: The absolute path of the file, already checked to be in the workspace.
+        target_file: The path as given by the caller, used in messages.
+        instructions: The edit instructions, see _apply_edit.
 
+    Returns:
+        None on success, otherwise the error message (already logged).
+    """
     if not os.path.exists(file_path):
         error_msg = f"File does not exist: {target_file} (resolved to {file_path})"
-        print(f"[ERROR] {error_msg}")
-        return {"success": False, "error": error_msg}
+        logger.error(error_msg)
+        return error_msg
 
     if not os.path.isfile(file_path):
         error_msg = f"Path is not a file: {target_file} (resolved to {file_path})"
-        print(f"[ERROR] {error_msg}")
-        return {"success": False, "error": error_msg}
+        logger.error(error_msg)
+        return error_msg
 
-    original_content = ""
+    operation = (
+        instructions.get("operation") if isinstance(instructions, dict) else None
+    )
     try:
-        async with aiofiles.open(file_path, "r", encoding="utf-8") as f:  # Use aiofiles
-            original_content = await f.read()
-    except (OSError, IOError) as e:
+        if operation in _OPERATIONS_WITHOUT_ORIGINAL:
+            original_content = ""  # Not needed, skip reading the file
+        else:
+            with open(file_path, "r", encoding="utf-8") as f:
+                original_content = f.read()
+    except OSError as e:
         error_msg = f"Failed to read file {target_file} for editing: {str(e)}"
-        print(f"[ERROR] {error_msg}")
-        return {"success": False, "error": error_msg}
+        logger.error(error_msg)
+        return error_msg
     except Exception as e:
         error_msg = f"Unexpected error reading file {target_file} for editing: {str(e)}"
-        print(f"[ERROR] {error_msg}")
-        return {"success": False, "error": error_msg}
+        logger.error(error_msg)
+        return error_msg
 
-    try:
-        new_content, error = await _apply_edit(
-            target_file,
-            original_content,
-            instructions,  # instructions should be a dict here
-        )
-        if error:
-            print(f"[ERROR] Failed to apply edit to {target_file}: {error}")
-            return {"success": False, "error": error}
-
-        async with aiofiles.open(file_path, "w", encoding="utf-8") as f:  # Use aiofiles
-            await f.write(new_content)
+    new_content, error = _apply_edit(target_file, original_content, instructions)
+    if error:
+        logger.error("Failed to apply edit to %s: %s", target_file, error)
+        return error
 
-        print(f"[INFO] File edited successfully: {target_file}")
-        return {
-            "success": True,
-            "message": f"File edited: {target_file}",
-            "file_path": file_path,  # Return absolute path
-            "explanation": explanation,
-        }
-    except (OSError, IOError) as e:
+    try:
+        _write_file_atomic(file_path, new_content)
+    except OSError as e:
         error_msg = f"Failed to write edited file {target_file}: {str(e)}"
-        print(f"[ERROR] {error_msg}")
-        return {"success": False, "error": error_msg}
+        logger.error(error_msg)
+        return error_msg
     except Exception as e:
         error_msg = f"Unexpected error editing file {target_file}: {str(e)}"
-        print(f"[ERROR] {error_msg}")
+        logger.error(error_msg)
+        return error_msg
+    return None
+
+
+async def edit_file(
+    agent, target_file: str, instructions: Dict[str, Any], explanation: str
+) -> Dict[str, Any]:
+    """
+    Edit an existing file with the specified instructions
+    :param agent: The agent instance (could be ToolExecutor or ApolloAgent)
+    :param target_file: Path to the file to edit, relative to workspace
+    :param instructions: Edit instructions
+    :param explanation: Explanation for the edit
+    :return: Dictionary with success/error information
+    """
+    if not target_file:
+        return {"success": False, "error": "Missing target file"}
+
+    target_file = os.path.normpath(target_file).lstrip(os.sep)
+    absolute_workspace_path = _workspace_root(agent)
+    file_path = os.path.abspath(os.path.join(absolute_workspace_path, target_file))
+
+    if logger.isEnabledFor(logging.DEBUG):  # The instructions hold the edit payload
+        logger.debug("Raw instructions received for edit: %s", instructions)
+
+    if not _is_within_workspace(file_path, absolute_workspace_path):
+        error_msg = f"Unsafe file path outside of workspace: {target_file} (resolved to {file_path})"
+        logger.error(error_msg)
         return {"success": False, "error": error_msg}
+
+    error = await asyncio.to_thread(
+        _edit_file_sync, file_path, target_file, instructions
+    )
+    if error:
+        return {"success": False, "error": error}
+
+    logger.info("File edited successfully: %s", target_file)
+    return {
+        "success": True,
+        "message": f"File edited: {target_file}",
+        "file_path": file_path,  # Return absolute path
+        "explanation": explanation,
+    }
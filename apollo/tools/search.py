@@ -9,14 +9,35 @@ License: BSD 3-Clause License - 2025
 """
 
 import asyncio
+import json
+import logging
 import os
 import re
 import fnmatch
-import aiofiles
-from typing import Dict, Any, AsyncGenerator, List
+import time
+from collections import OrderedDict
+from typing import (
+    Dict,
+    Any,
+    FrozenSet,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
 from thefuzz import fuzz
 from typing import Protocol
 
+from apollo.tools.files import _workspace_root
+
+try:  # Python 3.11+
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:  # pragma: no cover - Python 3.10
+    import sre_constants
+    import sre_parse
+
+logger = logging.getLogger(__name__)
+
 
 class AgentWithWorkspace(Protocol):
     """
@@ -27,6 +48,224 @@ class AgentWithWorkspace(Protocol):
     workspace_path: str
 
 
+# How long cached search results are reused. The files may be edited outside
+# the agent, where clear_search_caches() does not see it; the ToolExecutor
+# result cache expires its entries after the same time.
+SEARCH_CACHE_TTL_SECONDS = 60.0
+
+# codebase_search results keyed by (workspace root, keyword set), stored with the
+# time they were found. The match is "all keywords present", so rephrasings with
+# the same keywords share an entry.
+_CODEBASE_CACHE_MAX_ENTRIES = 512
+_codebase_cache: (
+    "OrderedDict[Tuple[str, FrozenSet[str]], Tuple[float, List[Dict[str, Any]]]]"
+) = OrderedDict()
+
+
+# file_search path index per workspace: {workspace: (built_at, [(rel, name, lower)])}.
+# Rebuilt after _FILE_INDEX_TTL_SECONDS or when the workspace is modified.
+_FILE_INDEX_TTL_SECONDS = 5.0
+_file_index: Dict[str, Tuple[float, List[Tuple[str, str, str]]]] = {}
+
+
+def clear_search_caches() -> None:
+    """
+    Drop cached search results; called after a tool modified the workspace.
+    """
+    _codebase_cache.clear()
+    _file_index.clear()
+
+
+def _iter_files(
+    root: str, skip_dirs: FrozenSet[str] = frozenset()
+) -> Iterator[Tuple[str, str]]:
+    """
+    Yield every file below a directory, in the same order as os.walk.
+
+    Uses os.scandir directly: the entries' cached file types decide what to
+    descend into, and entry.path saves re-joining each name to its directory.
+    Like os.walk, symlinks to directories are not followed and unreadable
+    directories are skipped.
+
+    Args:
+        root: The directory to traverse.
+        skip_dirs: Names of directories not to descend into, at any depth.
+
+    Yields:
+        (path, file_name) tuples.
+    """
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        subdirectories = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in skip_dirs:
+                                subdirectories.append(entry.path)
+                        elif entry.is_file():
+                            yield entry.path, entry.name
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+        pending.extend(reversed(subdirectories))
+
+
+def _build_file_index(workspace_path: str) -> List[Tuple[str, str, str]]:
+    """
+    Walk the workspace once and collect every file for fuzzy matching.
+
+    Args:
+        workspace_path: The workspace directory to index.
+
+    Returns:
+        A list of (relative_path, file_name, lowercase_file_name) tuples.
+    """
+    return [
+        (os.path.relpath(path, workspace_path), file_name, file_name.lower())
+        for path, file_name in _iter_files(workspace_path)
+    ]
+
+
+async def _get_file_index(workspace_path: str) -> List[Tuple[str, str, str]]:
+    """
+    Return the cached file index for a workspace, rebuilding it when stale.
+
+    Args:
+        workspace_path: The workspace directory to index.
+
+    Returns:
+        A list of (relative_path, file_name, lowercase_file_name) tuples.
+    """
+    cached = _file_index.get(workspace_path)
+    now = time.monotonic()
+    if cached and now - cached[0] < _FILE_INDEX_TTL_SECONDS:
+        return cached[1]
+    index = await asyncio.to_thread(_build_file_index, workspace_path)
+    _file_index[workspace_path] = (now, index)
+    return index
+
+
+# Extensions of the files codebase_search looks into.
+_CODEBASE_EXTENSIONS = frozenset(
+    {".py", ".js", ".ts", ".html", ".css", ".java", ".c", ".cpp", ".txt", ".md"}
+)
+# VCS metadata, dependencies, caches and build output: never worth searching.
+_CODEBASE_SKIP_DIRS = frozenset(
+    {
+        ".git",
+        ".hg",
+        ".svn",
+        "node_modules",
+        "__pycache__",
+        ".venv",
+        "venv",
+        ".tox",
+        ".mypy_cache",
+        ".pytest_cache",
+        "dist",
+        "build",
+        "target",
+    }
+)
+# Directories grep_search never looks into, with either backend.
+_GREP_SKIP_DIRS = frozenset({".git", ".hg", ".svn"})
+# Number of files codebase_search reads concurrently in worker threads.
+_CODEBASE_READ_BATCH = 32
+# Files are scanned in chunks of this size instead of being read whole.
+_CODEBASE_CHUNK_SIZE = 64 * 1024
+# Length of the content snippet returned per match, and the bytes kept for it
+# (enough for that many characters of UTF-8 text).
+_CODEBASE_SNIPPET_CHARS = 500
+_CODEBASE_SNIPPET_BYTES = 4 * (_CODEBASE_SNIPPET_CHARS + 1)
+
+
+def _list_candidate_files(root: str) -> List[str]:
+    """
+    List the files below root that codebase_search should scan.
+
+    Directories in _CODEBASE_SKIP_DIRS are pruned from the traversal, and
+    files are kept when their extension is in _CODEBASE_EXTENSIONS.
+
+    Args:
+        root: The directory to traverse.
+
+    Returns:
+        The matching file paths, in traversal order.
+    """
+    return [
+        path
+        for path, name in _iter_files(root, _CODEBASE_SKIP_DIRS)
+        if os.path.splitext(name)[1] in _CODEBASE_EXTENSIONS
+    ]
+
+
+def _content_snippet(raw: bytes) -> str:
+    """
+    Decode the start of a file into the snippet returned by codebase_search.
+
+    Args:
+        raw: The first bytes of the file (or all of them).
+
+    Returns:
+        At most _CODEBASE_SNIPPET_CHARS characters, with "..." when cut.
+    """
+    content = raw.decode("utf-8", errors="ignore")
+    # Same newlines as a file opened in text mode
+    content = content.replace("\r\n", "\n").replace("\r", "\n")
+    if len(content) > _CODEBASE_SNIPPET_CHARS:
+        return content[:_CODEBASE_SNIPPET_CHARS] + "..."
+    return content
+
+
+def _scan_if_matching(file_path: str, keywords: List[str]) -> Optional[str]:
+    """
+    Scan a file and return a snippet of it if it contains all the keywords.
+
+    ASCII keywords (the common case) are looked up chunk by chunk in the
+    lowered raw bytes, keeping an overlap so a keyword split across two
+    chunks is still found. The scan stops as soon as every keyword was seen,
+    and only the start of the file is kept for the snippet.
+
+    Args:
+        file_path: The file to scan.
+        keywords: Lowercase keywords that must all appear in the content.
+
+    Returns:
+        The content snippet, or None if a keyword is missing or the file is unreadable.
+    """
+    try:
+        with open(file_path, "rb") as f:
+            if not all(keyword.isascii() for keyword in keywords):
+                content_lower = f.read().decode("utf-8", errors="ignore").lower()
+                if not all(keyword in content_lower for keyword in keywords):
+                    return None
+                f.seek(0)
+                return _content_snippet(f.read(_CODEBASE_SNIPPET_BYTES))
+
+            missing = {keyword.encode() for keyword in keywords}
+            overlap = max(map(len, missing), default=1) - 1
+            head = b""
+            tail = b""
+            while missing:
+                chunk = f.read(_CODEBASE_CHUNK_SIZE)
+                if not chunk:
+                    return None
+                if not head:
+                    head = chunk[:_CODEBASE_SNIPPET_BYTES]
+                window = tail + chunk.lower()
+                missing = {needle for needle in missing if needle not in window}
+                tail = window[len(window) - overlap :] if overlap else b""
+    except OSError as e:
+        # Log OSError during file read and continue with other files
+        logger.error("Error reading file %s: %s", file_path, e)
+        return None
+    return _content_snippet(head)
+
+
 async def codebase_search(agent: AgentWithWorkspace, query: str) -> Dict[str, Any]:
     """
     Finds code snippets from the codebase most relevant to the search query.
@@ -45,13 +284,14 @@ async def codebase_search(agent: AgentWithWorkspace, query: str) -> Dict[str, An
         Returns an error structure if the workspace path is invalid.
     """
     results = []
-    # Ensure the workspace path is absolute to handle relative paths correctly
-    workspace_root_abs = os.path.abspath(agent.workspace_path)
+    # Absolute workspace path, cached by the ToolExecutor when available
+    workspace_root_abs = _workspace_root(agent)
 
     if not os.path.isdir(workspace_root_abs):
         # Log a warning and return an error if the workspace path is not a valid directory
-        print(
-            f"[WARNING] Workspace path is not a valid directory, skipping: {agent.workspace_path}"
+        logger.warning(
+            "Workspace path is not a valid directory, skipping: %s",
+            agent.workspace_path,
         )
         return {
             "query": query,
@@ -59,20 +299,6 @@ async def codebase_search(agent: AgentWithWorkspace, query: str) -> Dict[str, An
             "error": f"Workspace path '{agent.workspace_path}' is not a valid directory.",
         }
 
-    # Define file extensions to be included in the search.
-    included_extensions = (
-        ".py",
-        ".js",
-        ".ts",
-        ".html",
-        ".css",
-        ".java",
-        ".c",
-        ".cpp",
-        ".txt",
-        ".md",
-    )
-
     # Optional: Define a limit for the number of results
     max_result = 20
 
@@ -106,59 +332,47 @@ async def codebase_search(agent: AgentWithWorkspace, query: str) -> Dict[str, An
     # If after filtering, no meaningful keywords remain, we likely won't find good matches.
     # The 'all' logic below will handle this by not matching if query_keywords is empty.
 
-    for root, _, files in os.walk(workspace_root_abs):
-        for file_name in files:
-            if file_name.endswith(included_extensions):
-                file_path_abs = os.path.join(root, file_name)
-                try:
-                    async with aiofiles.open(
-                        file_path_abs, "r", encoding="utf-8", errors="ignore"
-                    ) as f:
-                        content = await f.read()
-
-                    content_lower = content.lower()
-                    match_found = False
-
-                    if query_keywords:  # Only proceed if we have keywords to search for
-                        # Check if all processed keywords are present in the content
-                        if all(keyword in content_lower for keyword in query_keywords):
-                            match_found = True
-
-                    if match_found:
-                        relative_file_path: str = os.path.relpath(
-                            file_path_abs, workspace_root_abs
-                        )
-                        results.append(
-                            {
-                                "file_path": relative_file_path,
-                                "content_snippet": (
-                                    content[:500] + "..."
-                                    if len(content) > 500
-                                    else content
-                                ),
-                                "relevance_score": 0.75,  # This is a placeholder, real relevance is complex
-                            }
-                        )
-                        if len(results) >= max_result:
-                            break  # Break from the inner files loop
-                except OSError as e:
-                    # Log OSError during file read and continue with other files
-                    print(f"[ERROR] Error reading file {file_path_abs}: {e}")
-                except RuntimeError as e:
-                    # Log other unexpected errors during file processing and continue
-                    print(
-                        f"[ERROR] Unexpected error processing file {file_path_abs}: {e}"
-                    )
-
-            if len(results) >= max_result:  # Check after processing each file
-                break  # Break from the inner files loop if limit reached
-
-        if (
-            len(results) >= max_result
-        ):  # Check after processing all files in a directory
-            break  # Break from the outer os.walk loop if limit reached
-
-    return {"query": query, "results": results}
+    cache_key = (workspace_root_abs, frozenset(query_keywords))
+    cached = _codebase_cache.get(cache_key)
+    if cached is not None:
+        if time.monotonic() - cached[0] < SEARCH_CACHE_TTL_SECONDS:
+            _codebase_cache.move_to_end(cache_key)
+            return {"query": query, "results": list(cached[1])}
+        del _codebase_cache[cache_key]  # Expired, search the files again
+
+    if query_keywords:  # Without keywords nothing can match, skip the reads
+        candidate_paths = await asyncio.to_thread(
+            _list_candidate_files, workspace_root_abs
+        )
+        # Read files concurrently in worker threads, one batch at a time in
+        # traversal order, so the search still stops soon after max_result hits
+        for start in range(0, len(candidate_paths), _CODEBASE_READ_BATCH):
+            batch = candidate_paths[start : start + _CODEBASE_READ_BATCH]
+            snippets = await asyncio.gather(
+                *(
+                    asyncio.to_thread(_scan_if_matching, path, query_keywords)
+                    for path in batch
+                )
+            )
+            for file_path_abs, snippet in zip(batch, snippets):
+                if snippet is None:
+                    continue
+                results.append(
+                    {
+                        "file_path": os.path.relpath(file_path_abs, workspace_root_abs),
+                        "content_snippet": snippet,
+                        "relevance_score": 0.75,  # This is a placeholder, real relevance is complex
+                    }
+                )
+                if len(results) >= max_result:
+                    break
+            if len(results) >= max_result:
+                break
+
+    _codebase_cache[cache_key] = (time.monotonic(), results)
+    if len(_codebase_cache) > _CODEBASE_CACHE_MAX_ENTRIES:
+        _codebase_cache.popitem(last=False)
+    return {"query": query, "results": list(results)}
 
 
 def match_pattern_sync(filename: str, pattern: str) -> bool:
@@ -175,32 +389,232 @@ def match_pattern_sync(filename: str, pattern: str) -> bool:
     return fnmatch.fnmatch(filename, pattern)
 
 
-async def _walk_files_async(dir_path: str) -> AsyncGenerator[str, None]:
+_REGEX_METACHARACTERS = frozenset(".^$*+?{}[]\\|()")
+_RIPGREP_STREAM_LIMIT = 1024 * 1024
+
+
+def _is_literal_query(query: str) -> bool:
+    """
+    Check whether a grep query contains no regex metacharacters.
+
+    Args:
+        query: The pattern received by grep_search.
+
+    Returns:
+        True if the query can be searched as a fixed string.
+    """
+    return not any(char in _REGEX_METACHARACTERS for char in query)
+
+
+def _literal_alternatives(query: str) -> Optional[List[str]]:
+    """
+    Split a query of the form ``foo|bar|baz`` into its literal branches.
+
+    Args:
+        query: The pattern received by grep_search.
+
+    Returns:
+        The list of literal branches, or None if any branch is empty or
+        contains other regex syntax.
+    """
+    if "|" not in query:
+        return None
+    branches = query.split("|")
+    if all(branch and _is_literal_query(branch) for branch in branches):
+        return branches
+    return None
+
+
+_UNBOUNDED_REPEATS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT)
+
+
+def _has_nested_unbounded_repeat(subpattern, inside_repeat: bool = False) -> bool:
+    """
+    Walk a parsed regex looking for an unbounded repeat inside another one.
+
+    Args:
+        subpattern: A parsed (sub)pattern as returned by sre_parse.parse.
+        inside_repeat: Whether the walk is already below an unbounded repeat.
+
+    Returns:
+        True if a construct like ``(a+)+`` or ``(x*)*`` is found.
+    """
+    for op, av in subpattern:
+        if op in _UNBOUNDED_REPEATS:
+            _, max_repeat, body = av
+            unbounded = max_repeat == sre_constants.MAXREPEAT
+            if unbounded and inside_repeat:
+                return True
+            if _has_nested_unbounded_repeat(body, inside_repeat or unbounded):
+                return True
+            continue
+        children = av if isinstance(av, (list, tuple)) else (av,)
+        for child in children:
+            if isinstance(child, list):  # BRANCH alternatives
+                if any(_has_nested_unbounded_repeat(c, inside_repeat) for c in child):
+                    return True
+            elif isinstance(child, sre_parse.SubPattern):
+                if _has_nested_unbounded_repeat(child, inside_repeat):
+                    return True
+    return False
+
+
+def _is_regex_safe(pattern: str, flags: int = 0) -> bool:
+    """
+    Reject patterns that can backtrack exponentially in Python's re engine.
+
+    Args:
+        pattern: The regex pattern to check.
+        flags: The flags the pattern will be compiled with.
+
+    Returns:
+        False if the pattern nests unbounded repeats (e.g. ``(a+)+b``).
+    """
+    try:
+        return not _has_nested_unbounded_repeat(sre_parse.parse(pattern, flags))
+    except (re.error, RecursionError):
+        return False
+
+
+async def _run_ripgrep(
+    query: str, workspace_path: str, max_results: int, ignore_case: bool
+) -> Optional[List[Dict[str, Any]]]:
     """
-    Asynchronously generates file paths from a directory tree.
-    Wraps os.walk in an executor to make it non-blocking.
-    Note: This version collects all paths first in the executor, then yields.
-    For extremely large directory trees, a more advanced streaming approach
-    (e.g., using an asyncio.Queue with a producer thread) would be more memory-efficient.
+    Search the workspace with ripgrep, streaming its JSON event output.
+
+    Args:
+        query: The regex pattern (or literal string) to search for.
+        workspace_path: The directory to search.
+        max_results: Stop reading events once this many matches were collected.
+        ignore_case: Whether the search is case-insensitive.
+
+    Returns:
+        A list of match dictionaries, or None if ripgrep is not installed
+        or rejected the pattern, so the caller can fall back to Python.
     """
-    loop = asyncio.get_running_loop()
+    # Search hidden and ignored files too, like the Python fallback, so the
+    # results do not depend on whether rg is installed; only VCS data is skipped
+    args = ["rg", "--json", "--max-columns=150", "--hidden", "--no-ignore"]
+    args += [f"--glob=!{name}" for name in sorted(_GREP_SKIP_DIRS)]
+    if ignore_case:
+        args.append("-i")
+    alternatives = _literal_alternatives(query)
+    if alternatives:
+        # Multi-literal alternation: fixed-string patterns let ripgrep use its
+        # multi-substring prefilter instead of the regex engine
+        args.append("-F")
+        for alternative in alternatives:
+            args += ["-e", alternative]
+        args += ["--", workspace_path]
+    else:
+        if _is_literal_query(query):
+            args.append("-F")
+        args += ["--", query, workspace_path]
 
-    def _synchronous_walk():
-        paths = []
-        for root_dir, _, files_in_dir in os.walk(dir_path):
-            for file_name in files_in_dir:
-                paths.append(os.path.join(root_dir, file_name))
-        return paths
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            limit=_RIPGREP_STREAM_LIMIT,
+        )
+    except FileNotFoundError:
+        return None
 
+    results: List[Dict[str, Any]] = []
     try:
-        file_paths = await loop.run_in_executor(None, _synchronous_walk)
-        for path in file_paths:
-            yield path
-    except RuntimeError:
-        # If os.walk itself fails (e.g., the path doesn't exist, permissions),
-        # this generator will stop. Errors during a walk can be logged here if needed.
-        # The main function will then have no files to process from this generator.
-        return
+        async for raw_event in process.stdout:
+            event = json.loads(raw_event)
+            if event.get("type") != "match":
+                continue
+            data = event["data"]
+            path_text = data["path"].get("text")
+            if path_text is None:  # Non UTF-8 path, reported as base64 bytes
+                continue
+            results.append(
+                {
+                    "file": os.path.relpath(path_text, workspace_path),
+                    "line_number": data["line_number"],
+                    "content": data["lines"].get("text", "").strip(),
+                }
+            )
+            if len(results) >= max_results:
+                break
+    finally:
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+        await process.wait()
+
+    # Exit code 2 without any match means ripgrep failed (e.g. it does not
+    # support the Python regex syntax used), let the caller retry in Python.
+    if process.returncode == 2 and not results:
+        return None
+    return results
+
+
+def _grep_file(
+    file_path: str, compiled_regex: "re.Pattern[str]", limit: int
+) -> List[Tuple[int, str]]:
+    """
+    Search a file line by line with a compiled regex.
+
+    Args:
+        file_path: The file to search.
+        compiled_regex: The pattern, matched against each line on its own.
+        limit: Stop after this many matching lines.
+
+    Returns:
+        (line_number, stripped_line) tuples of the matching lines.
+    """
+    matches = []
+    search = compiled_regex.search
+    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+        for line_number, line in enumerate(f, 1):
+            if search(line):
+                matches.append((line_number, line.strip()))
+                if len(matches) >= limit:
+                    break
+    return matches
+
+
+def _grep_workspace(
+    workspace_path: str, compiled_regex: "re.Pattern[str]", max_results: int
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, str]]]:
+    """
+    Search the workspace files with a compiled regex, stopping at max_results.
+
+    The traversal is lazy, so the remaining directories are never listed
+    once the cap is reached.
+
+    Args:
+        workspace_path: The directory to search.
+        compiled_regex: The pattern, matched against each line on its own.
+        max_results: The maximum number of matching lines to collect.
+
+    Returns:
+        A tuple of (results, errors) in the grep_search result format.
+    """
+    results: List[Dict[str, Any]] = []
+    errors: List[Dict[str, str]] = []
+    if max_results <= 0:
+        return results, errors
+    for file_path, _ in _iter_files(workspace_path, _GREP_SKIP_DIRS):
+        relative_file_path = os.path.relpath(file_path, workspace_path)
+        try:
+            matches = _grep_file(file_path, compiled_regex, max_results - len(results))
+        except OSError as e:
+            errors.append({"file": relative_file_path, "error": f"OSError: {e}"})
+            continue
+        results.extend(
+            {"file": relative_file_path, "line_number": line_number, "content": line}
+            for line_number, line in matches
+        )
+        if len(results) >= max_results:
+            break
+    return results, errors
 
 
 async def grep_search(
@@ -212,6 +626,7 @@ async def grep_search(
     """
     Asynchronously searches for a regex pattern within files in a directory.
     Best for finding specific strings or patterns.
+    Uses ripgrep when it is installed, falling back to a pure-Python scan.
 
     Args:
         agent: An object with a `workspace_path` string attribute.
@@ -222,9 +637,6 @@ async def grep_search(
     Returns:
         Dictionary with search results, including any errors encountered.
     """
-    results: List[Dict[str, Any]] = []
-    errors: List[Dict[str, str]] = []
-
     if not hasattr(agent, "workspace_path") or not isinstance(
         agent.workspace_path, str
     ):
@@ -249,41 +661,43 @@ async def grep_search(
             "errors": [{"file": "N/A", "error": f"Invalid regex pattern: {e}"}],
         }
 
-    async for file_path_str in _walk_files_async(agent.workspace_path):
-        if len(results) >= max_results:
-            break
-
-        relative_file_path = os.path.relpath(file_path_str, agent.workspace_path)
-        try:
-            async with aiofiles.open(
-                file_path_str, "r", encoding="utf-8", errors="ignore"
-            ) as f:
-                line_number = 0
-                async for line in f:
-                    line_number += 1
-                    if len(results) >= max_results:
-                        break
-
-                    match = await asyncio.to_thread(compiled_regex.search, line)
-                    if match:
-                        results.append(
-                            {
-                                "file": relative_file_path,
-                                "line_number": line_number,
-                                "content": line.strip(),
-                            }
-                        )
-                        if len(results) >= max_results:
-                            break
-        except OSError as e:
-            errors.append({"file": relative_file_path, "error": f"OSError: {e}"})
-        except RuntimeError as e:
-            errors.append(
-                {"file": relative_file_path, "error": f"Unexpected error: {e}"}
-            )
+    # ripgrep only understands the case-insensitive flag, other flags need Python.
+    if not regex_flags & ~re.IGNORECASE:
+        rg_results = await _run_ripgrep(
+            query,
+            agent.workspace_path,
+            max_results,
+            ignore_case=bool(regex_flags & re.IGNORECASE),
+        )
+        if rg_results is not None:
+            return {
+                "query": query,
+                "results": rg_results,
+                "total_matches_found": len(rg_results),
+                "capped": len(rg_results) >= max_results,
+                "errors": [],
+            }
+
+    # ripgrep's automata engine is immune, Python's backtracking engine is not
+    if not _is_regex_safe(query, regex_flags):
+        return {
+            "query": query,
+            "results": [],
+            "total_matches_found": 0,
+            "capped": False,
+            "errors": [
+                {
+                    "file": "N/A",
+                    "error": "Regex pattern may backtrack catastrophically "
+                    "(nested unbounded repeats)",
+                }
+            ],
+        }
 
-        if len(results) >= max_results:
-            break
+    # Walk and scan in one worker thread, so the walk stops at the result cap
+    results, errors = await asyncio.to_thread(
+        _grep_workspace, agent.workspace_path, compiled_regex, max_results
+    )
 
     return {
         "query": query,
@@ -316,31 +730,24 @@ async def file_search(
     results = []
     query_lower = query.lower()
 
-    # Iterate over files in the workspace
-    for root, _, files in os.walk(agent.workspace_path):
-        for file_name in files:
-            file_name_lower = file_name.lower()
-            score = fuzz.partial_ratio(query_lower, file_name_lower)
-
-            if score >= threshold:
-                # If the score is above the threshold, consider it a match
-                full_file_path = os.path.join(root, file_name)
-                relative_file_path = os.path.relpath(
-                    full_file_path, agent.workspace_path
-                )
-                results.append(
-                    {
-                        "file_path": relative_file_path,
-                        "filename": file_name,
-                        "similarity_score": score,
-                    }
-                )
-
-                if len(results) >= max_results:
-                    break
+    # Match against the cached path index instead of re-walking the workspace
+    for relative_file_path, file_name, file_name_lower in await _get_file_index(
+        agent.workspace_path
+    ):
+        score = fuzz.partial_ratio(query_lower, file_name_lower)
+
+        if score >= threshold:
+            # If the score is above the threshold, consider it a match
+            results.append(
+                {
+                    "file_path": relative_file_path,
+                    "filename": file_name,
+                    "similarity_score": score,
+                }
+            )
 
-        if len(results) >= max_results:
-            break
+            if len(results) >= max_results:
+                break
 
     return {
         "query": query,
@@ -10,7 +10,7 @@ License: BSD 3-Clause License - 2025
 """
 
 import random
-from typing import Dict, List
+from typing import Dict, List, NamedTuple, Optional, Tuple
 from urllib.parse import quote_plus
 
 import httpx
@@ -19,19 +19,71 @@ from bs4 import BeautifulSoup
 from apollo.config.const import Constant
 
 
-async def web_search(query: str) -> List[Dict[str, str]]:
+class SearchResult(NamedTuple):
+    """A single web or wiki search hit."""
+
+    title: str
+    url: str
+    snippet: str
+
+
+# Conditional-request validators per search URL: {url: (etag, last_modified, results)}.
+# A 304 answer lets us skip both the body transfer and the BeautifulSoup parse.
+_etag_cache: Dict[str, Tuple[Optional[str], Optional[str], List[SearchResult]]] = {}
+_ETAG_CACHE_MAX_ENTRIES = 128
+
+
+def _conditional_headers(url: str) -> Dict[str, str]:
+    """
+    Build the revalidation headers for a previously fetched search URL.
+
+    Args:
+        url: The search URL about to be requested.
+
+    Returns:
+        A dictionary with If-None-Match / If-Modified-Since when validators are known.
+    """
+    etag, last_modified, _ = _etag_cache.get(url, (None, None, None))
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    return headers
+
+
+def _store_validators(url: str, resp, results: List[SearchResult]) -> None:
+    """
+    Remember the ETag / Last-Modified validators of a search response with its results.
+
+    Args:
+        url: The search URL that was requested.
+        resp: The HTTP response received for the URL.
+        results: The parsed search results for the response.
+    """
+    etag = resp.headers.get("ETag")
+    last_modified = resp.headers.get("Last-Modified")
+    if not etag and not last_modified:
+        return
+    if url not in _etag_cache and len(_etag_cache) >= _ETAG_CACHE_MAX_ENTRIES:
+        _etag_cache.pop(next(iter(_etag_cache)))
+    _etag_cache[url] = (etag, last_modified, results)
+
+
+async def web_search(query: str) -> List[SearchResult]:
     """
     Fetches search results from DuckDuckGo using its HTML search page.
 
     This asynchronous function performs a search query on DuckDuckGo and parses the
     returned HTML for search results. Each search result includes the title of the
-    result, its URL, and a snippet (if available). The function returns a list of
-    such results structured as dictionaries.
+    result, its URL, and a snippet (if available). The function returns them as a
+    list of SearchResult named tuples; the ToolExecutor turns them into
+    dictionaries only when it serializes the tool result.
 
     :param query: Str - Search query string to be sent to DuckDuckGo.
-    :return: A list of dictionaries, where each dictionary contains 'title', 'url',
-        and 'snippet' representing a search result.
-    :rtype: List[Dict[str, str]]
+    :return: A list of SearchResult tuples, each with 'title', 'url',
+        and 'snippet' fields representing a search result.
+    :rtype: List[SearchResult]
     """
     url = f"https://html.duckduckgo.com/html/?q={quote_plus(query)}"
     headers = {
@@ -39,7 +91,10 @@ async def web_search(query: str) -> List[Dict[str, str]]:
     }
 
     async with httpx.AsyncClient(headers=headers, timeout=20.0) as client:
-        resp = await client.get(url)
+        resp = await client.get(url, headers=_conditional_headers(url))
+        if resp.status_code == 304 and url in _etag_cache:
+            return list(_etag_cache[url][2])
+
         soup = BeautifulSoup(resp.text, "html.parser")
         results = []
 
@@ -50,20 +105,22 @@ async def web_search(query: str) -> List[Dict[str, str]]:
 
             if title_tag and link_tag:
                 results.append(
-                    {
-                        "title": title_tag.get_text(strip=True),
-                        "url": link_tag.get("href"),
-                        "snippet": (
+                    SearchResult(
+                        title=title_tag.get_text(strip=True),
+                        url=link_tag.get("href"),
+                        snippet=(
                             snippet_tag.get_text(strip=True)
                             if snippet_tag
                             else "No snippet available."
                         ),
-                    }
+                    )
                 )
+        if resp.status_code == 200:
+            _store_validators(url, resp, results)
         return results
 
 
-async def wiki_search(query: str) -> List[Dict[str, str]]:
+async def wiki_search(query: str) -> List[SearchResult]:
     """
     Fetches search results from Wikipedia for a given query string asynchronously.
 
@@ -71,19 +128,22 @@ async def wiki_search(query: str) -> List[Dict[str, str]]:
     search query.
     It parses the HTML response to extract search result titles, URLs,
     and snippets.
-    The extracted data is returned as a list of dictionaries, each containing
+    The extracted data is returned as a list of SearchResult tuples, each containing
     the title, URL, and snippet of a result.
 
     :param query: Str - The query string to search for on Wikipedia.
-    :return: A list of dictionaries containing titles, URLs, and snippets of the search results.
-    :rtype: List[Dict[str, str]]
+    :return: A list of SearchResult tuples with titles, URLs, and snippets of the search results.
+    :rtype: List[SearchResult]
     """
     url = f"https://en.wikipedia.org/w/index.php?search={quote_plus(query)}"
     headers = {
         "User-Agent": random.choice(Constant.user_agents),
     }
     async with httpx.AsyncClient(headers=headers, timeout=20.0) as client:
-        resp = await client.get(url)
+        resp = await client.get(url, headers=_conditional_headers(url))
+        if resp.status_code == 304 and url in _etag_cache:
+            return list(_etag_cache[url][2])
+
         soup = BeautifulSoup(resp.text, "html.parser")
         results = []
         # Iterate over each search result a heading element
@@ -116,10 +176,12 @@ async def wiki_search(query: str) -> List[Dict[str, str]]:
                 #     snippet_to_store = snippet_container_div.get_text(strip=True)
 
             results.append(
-                {
-                    "title": title_text,
-                    "url": link_url,
-                    "snippet": snippet_to_store,
-                }
+                SearchResult(
+                    title=title_text,
+                    url=link_url,
+                    snippet=snippet_to_store,
+                )
             )
+        if resp.status_code == 200:
+            _store_validators(url, resp, results)
         return results
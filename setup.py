@@ -55,6 +55,9 @@ setup(
             "pytest-cov~=6.1.1",
             "pytest-asyncio>=0.23.5",
         ],
+        "fast": [
+            "orjson>=3.9",
+        ],
     },
     entry_points={
         "console_scripts": [
@@ -7,6 +7,7 @@ Author: Alberto Barrago
 License: BSD 3-Clause License - 2025
 """
 
+import asyncio
 import unittest
 from unittest.mock import patch, AsyncMock
 from unittest import IsolatedAsyncioTestCase
@@ -87,15 +88,30 @@ class TestApolloAgent(IsolatedAsyncioTestCase):
         await ApolloAgent.chat_terminal()
         mock_print.assert_any_call("\nExiting chat.")
 
-    @patch("os.path.exists")
-    @patch("os.makedirs")
-    async def test_chat_terminal_workspace_creation(self, mock_makedirs, mock_exists):
+    @patch("builtins.print")
+    @patch("pathlib.Path.mkdir")
+    async def test_chat_terminal_cancelled_exits_cleanly(self, _, mock_print):
+        """Test that Ctrl+C (the task being cancelled) still runs the cleanup."""
+        with patch(
+            "apollo.agent._read_input", side_effect=asyncio.CancelledError
+        ), patch(
+            "apollo.tools.core.ApolloCore.aclose", new_callable=AsyncMock
+        ) as mock_aclose, patch(
+            "apollo.agent.stop_logging"
+        ) as mock_stop_logging:
+            await ApolloAgent.chat_terminal()
+
+        mock_print.assert_any_call("\nExiting chat.")
+        mock_aclose.assert_awaited_once()
+        mock_stop_logging.assert_called_once()
+
+    @patch("pathlib.Path.mkdir")
+    async def test_chat_terminal_workspace_creation(self, mock_mkdir):
         """Test workspace directory creation in the chat terminal."""
-        mock_exists.return_value = False
         # Patch input for this specific test run
         with patch("builtins.input", side_effect=["exit"]):
             await ApolloAgent.chat_terminal()
-        mock_makedirs.assert_called_once_with(Constant.workspace_cabled)
+        mock_mkdir.assert_called_once_with(parents=True, exist_ok=True)
 
     async def test_chat_terminal_exit_workspace(self):
         """Test chat terminal with exit workspace."""
@@ -7,11 +7,15 @@ Author: Alberto Barrago
 License: BSD 3-Clause License - 2025
 """
 
+import asyncio
+import time
 import unittest
 from unittest import IsolatedAsyncioTestCase
 from unittest.mock import patch, MagicMock, AsyncMock
 
-from apollo.tools.core import ApolloCore
+import ollama
+
+from apollo.tools.core import _OLLAMA_TOOLS, ApolloCore
 from apollo.service.tool.executor import ToolExecutor
 from apollo.config.const import Constant
 from apollo.config.instructions import get_available_tools
@@ -33,6 +37,17 @@ class TestApolloCore(IsolatedAsyncioTestCase):  # Renamed for clarity
         # Mock external dependencies that are not the focus of ApolloCore logic
         self.mock_ollama_client_chat = AsyncMock()
         self.core.ollama_client.chat = self.mock_ollama_client_chat
+        # Keep the background history writes away from the real session files;
+        # cleanups run last-in first-out, so pending saves finish under the patch
+        save_patcher = patch("apollo.tools.core.save_user_history_to_json")
+        save_patcher.start()
+        self.addCleanup(save_patcher.stop)
+        self.addAsyncCleanup(self._flush_persisted_messages)
+
+    async def _flush_persisted_messages(self):
+        """Wait for the history writes scheduled during the test."""
+        if self.core._persist_task is not None:
+            await self.core._persist_task
 
     async def test_process_llm_response_with_content(self):
         """Test processing LLM response with content and no tool calls."""
@@ -138,25 +153,31 @@ class TestApolloCore(IsolatedAsyncioTestCase):  # Renamed for clarity
             "id": "call_fail",
             "function": {"name": "fail_tool", "arguments": "{}"},
         }
+        tool_call_broken = {
+            "id": "call_broken",
+            "function": {"name": "broken_tool", "arguments": "{}"},
+        }
 
         async def mock_execute_side_effect(tool_call_arg):
             if tool_call_arg["function"]["name"] == "success_tool":
                 return "success_output"
             elif tool_call_arg["function"]["name"] == "fail_tool":
                 raise RuntimeError("Tool failed!")
+            elif tool_call_arg["function"]["name"] == "broken_tool":
+                raise ValueError("Bad arguments")
             return "default_output"
 
         with patch.object(
             self.core, "_execute_tool", side_effect=mock_execute_side_effect
         ) as mock_execute:
             result, _ = await self.core._handle_tool_calls(
-                [tool_call_success, tool_call_fail], 1, []
+                [tool_call_success, tool_call_fail, tool_call_broken], 1, []
             )
 
         self.assertIsNone(
             result
         )  # No loop detection or error from _handle_tool_calls itself
-        self.assertEqual(len(self.core.chat_history), 2)  # Two tool outputs
+        self.assertEqual(len(self.core.chat_history), 3)  # Three tool outputs
         self.assertEqual(self.core.chat_history[0]["role"], "tool")
         self.assertEqual(self.core.chat_history[0]["tool_call_id"], "call_ok")
         self.assertEqual(self.core.chat_history[0]["content"], "success_output")
@@ -166,6 +187,106 @@ class TestApolloCore(IsolatedAsyncioTestCase):  # Renamed for clarity
             "[ERROR] Exception during tool execution: Tool failed!",
             self.core.chat_history[1]["content"],
         )
+        self.assertEqual(self.core.chat_history[2]["tool_call_id"], "call_broken")
+        self.assertIn("Bad arguments", self.core.chat_history[2]["content"])
+
+    async def test_handle_tool_calls_overlaps_reads_and_orders_edits(self):
+        """Test read-only tools run concurrently while edits act as barriers."""
+        events = []
+        both_reads_started = asyncio.Event()
+
+        async def mock_execute_side_effect(tool_call_arg):
+            name = tool_call_arg["function"]["name"]
+            events.append(f"start {name}")
+            if name.startswith("grep_search"):
+                if len(events) == 2:
+                    both_reads_started.set()
+                # Only completes if the other read started meanwhile
+                await asyncio.wait_for(both_reads_started.wait(), timeout=1)
+            events.append(f"end {name}")
+            return f"{name} output"
+
+        tool_calls = [
+            {"id": "1", "function": {"name": "grep_search", "arguments": {"q": "a"}}},
+            {"id": "2", "function": {"name": "grep_search", "arguments": {"q": "b"}}},
+            {"id": "3", "function": {"name": "edit_file", "arguments": {}}},
+            {"id": "4", "function": {"name": "list_dir", "arguments": {}}},
+        ]
+        with patch.object(
+            self.core, "_execute_tool", side_effect=mock_execute_side_effect
+        ):
+            result, _ = await self.core._handle_tool_calls(tool_calls, 1, [])
+
+        self.assertIsNone(result)
+        self.assertEqual(events[:2], ["start grep_search", "start grep_search"])
+        self.assertEqual(
+            events[4:],
+            ["start edit_file", "end edit_file", "start list_dir", "end list_dir"],
+        )
+        self.assertEqual(
+            [output["tool_call_id"] for output in self.core.chat_history],
+            ["1", "2", "3", "4"],
+        )
+
+    def test_append_to_history_trims_to_token_budget(self):
+        """Test that the oldest messages are dropped once over the token budget."""
+        old_call = {"role": "assistant", "content": "", "tool_calls": ["x" * 40]}
+        old_result = {"role": "tool", "content": "y" * 40}
+        latest = {"role": "user", "content": "z" * 40}
+
+        with patch.object(Constant, "max_history_tokens", 30):
+            self.core._append_to_history([old_call, old_result])
+            self.assertEqual(len(self.core.chat_history), 2)
+            self.core._append_to_history([latest])
+
+        # The orphaned tool result goes together with its assistant call
+        self.assertEqual(self.core.chat_history, [latest])
+        self.assertEqual(self.core._history_tokens, 14)
+
+    def test_append_to_history_caps_message_count(self):
+        """Test that the history keeps at most max_llm_history_messages messages."""
+        messages = [{"role": "user", "content": str(i)} for i in range(6)]
+
+        with patch.object(Constant, "max_llm_history_messages", 4):
+            self.core._append_to_history(messages[:4])
+            self.assertEqual(self.core.chat_history, messages[:4])  # At the limit
+            self.core._append_to_history(messages[4:])
+
+        # Trimmed to 3/4 of the limit, leaving room before the next trim
+        self.assertEqual(self.core.chat_history, messages[3:])
+        self.assertEqual(self.core._history_tokens, 12)
+
+    async def test_handle_tool_calls_runs_duplicate_calls_once(self):
+        """Test that identical tool calls in one turn share a single execution."""
+        tool_calls = [
+            {"id": "1", "function": {"name": "list_dir", "arguments": {"a": 1}}},
+            {"id": "2", "function": {"name": "list_dir", "arguments": '{"a": 1}'}},
+            {"id": "3", "function": {"name": "list_dir", "arguments": {"a": 2}}},
+        ]
+        with patch.object(
+            self.core, "_execute_tool", new_callable=AsyncMock
+        ) as mock_execute:
+            mock_execute.side_effect = lambda call: call["id"]
+            await self.core._handle_tool_calls(tool_calls, 1, [])
+
+        self.assertEqual(mock_execute.call_count, 2)
+        self.assertEqual(
+            [output["content"] for output in self.core.chat_history], ["1", "1", "3"]
+        )
+
+    async def test_aclose_closes_pooled_http_client(self):
+        """Test that aclose uses the public close() of the Ollama client."""
+        self.core.ollama_client = MagicMock(close=AsyncMock())
+        await self.core.aclose()
+        self.core.ollama_client.close.assert_awaited_once()
+        self.core.ollama_client._client.aclose.assert_not_called()
+
+    async def test_aclose_without_public_close(self):
+        """Test the fallback for ollama releases whose AsyncClient has no close()."""
+        self.core.ollama_client = MagicMock(spec=["_client"])
+        self.core.ollama_client._client.aclose = AsyncMock()
+        await self.core.aclose()
+        self.core.ollama_client._client.aclose.assert_awaited_once()
 
     async def test_get_llm_response_from_ollama(self):
         """Test _get_llm_response_from_ollama calls the client correctly."""
@@ -178,11 +299,17 @@ class TestApolloCore(IsolatedAsyncioTestCase):  # Renamed for clarity
         self.mock_ollama_client_chat.assert_called_once_with(
             model=Constant.llm_model,
             messages=self.core.chat_history,
-            tools=get_available_tools(),  # from apollo.config.instructions
+            tools=_OLLAMA_TOOLS,
             stream=True,
             options={},
+            keep_alive=Constant.ollama_keep_alive,
         )
         self.assertEqual(stream, expected_stream_result)
+        # Same models the client would build from the schema dicts on each call
+        self.assertEqual(
+            _OLLAMA_TOOLS,
+            [ollama.Tool.model_validate(tool) for tool in get_available_tools()],
+        )
 
     @patch("apollo.tools.core.ApolloCore._initialize_chat_session")
     @patch("apollo.tools.core.ApolloCore.start_iterations", new_callable=AsyncMock)
@@ -231,6 +358,20 @@ class TestApolloCore(IsolatedAsyncioTestCase):  # Renamed for clarity
         self.assertIn("Disk full", response["error"])
         self.assertFalse(self.core._chat_in_progress)  # Check finally block
 
+    @patch("apollo.tools.core.ApolloCore._initialize_chat_session")
+    @patch("apollo.tools.core.ApolloCore.start_iterations", new_callable=AsyncMock)
+    async def test_handle_request_routes_chat_only_requests(self, _, __):
+        """Test that short conversational requests use chat_llm_model when set."""
+        with patch.object(Constant, "chat_llm_model", "small-model"):
+            await self.core.handle_request("Follow this... The command is: $Hi there!")
+            self.assertEqual(self.core._turn_model, "small-model")
+
+            await self.core.handle_request("The command is: $list the files in src")
+            self.assertEqual(self.core._turn_model, Constant.llm_model)
+
+        await self.core.handle_request("The command is: $Hi there!")
+        self.assertEqual(self.core._turn_model, Constant.llm_model)
+
     async def test_handle_request_concurrent_request(self):
         """Test handling concurrent requests (existing test)."""
         self.core._chat_in_progress = True  # Set flag to simulate ongoing request
@@ -271,6 +412,159 @@ class TestApolloCore(IsolatedAsyncioTestCase):  # Renamed for clarity
         response = await self.core.start_iterations(0, [])
         self.assertIn("No content or tools were provided", response["response"])
 
+    @patch("apollo.tools.core.save_user_history_to_json")
+    @patch(
+        "apollo.tools.core.ApolloCore._get_llm_response_from_ollama",
+        new_callable=AsyncMock,
+    )
+    async def test_start_iterations_streams_tokens_to_callback(self, mock_get_llm, _):
+        """Test that streamed content is forwarded to on_token chunk by chunk."""
+        llm_chunks = [
+            {"message": {"role": "assistant", "content": "Hel"}},
+            {"message": {"role": "assistant", "content": "lo"}},
+            {"done": True, "total_duration": 300, "message": {"role": "assistant"}},
+        ]
+        mock_get_llm.return_value = mock_async_iterator(llm_chunks)
+        tokens = []
+        self.core.on_token = tokens.append
+
+        response = await self.core.start_iterations(0, [])
+
+        self.assertEqual(tokens, ["Hel", "lo"])
+        self.assertTrue(response["response"].endswith("Hello"))
+
+    @patch("apollo.tools.core.save_user_history_to_json")
+    @patch(
+        "apollo.tools.core.ApolloCore._get_llm_response_from_ollama",
+        new_callable=AsyncMock,
+    )
+    async def test_start_iterations_keeps_plain_dicts_in_history(self, mock_get_llm, _):
+        """Test that streamed Ollama Message objects enter the history as dicts."""
+        llm_chunks = [
+            {"message": ollama.Message(role="assistant", content="Hi")},
+            {"done": True, "message": ollama.Message(role="assistant", content="")},
+        ]
+        mock_get_llm.return_value = mock_async_iterator(llm_chunks)
+
+        await self.core.start_iterations(0, [])
+
+        self.assertEqual(
+            self.core.chat_history[-1], {"role": "assistant", "content": "Hi"}
+        )
+
+    @patch("apollo.tools.core.save_user_history_to_json")
+    @patch(
+        "apollo.tools.core.ApolloCore._get_llm_response_from_ollama",
+        new_callable=AsyncMock,
+    )
+    async def test_start_iterations_reuses_cached_llm_answer(self, mock_get_llm, _):
+        """Test that an identical history is answered from the LLM cache."""
+        mock_get_llm.side_effect = lambda: mock_async_iterator(
+            [{"done": True, "message": {"role": "assistant", "content": "Hi!"}}]
+        )
+
+        self.core.chat_history = [{"role": "user", "content": "hello"}]
+        first = await self.core.start_iterations(0, [])
+        self.core.chat_history = [{"role": "user", "content": "hello"}]
+        second = await self.core.start_iterations(0, [])
+        self.core.chat_history = [{"role": "user", "content": "bye"}]
+        await self.core.start_iterations(0, [])
+
+        self.assertTrue(first["response"].endswith("Hi!"))
+        self.assertTrue(second["response"].endswith("Hi!"))
+        self.assertEqual(mock_get_llm.call_count, 2)
+
+    @patch("apollo.tools.core.save_user_history_to_json")
+    @patch(
+        "apollo.tools.core.ApolloCore._get_llm_response_from_ollama",
+        new_callable=AsyncMock,
+    )
+    async def test_start_iterations_asks_to_conclude_before_last_round(
+        self, mock_get_llm, _
+    ):
+        """Test that the model is told to wrap up before the final iteration."""
+        tool_call = {"id": "1", "function": {"name": "list_dir", "arguments": {}}}
+        histories = []
+
+        def llm_response():
+            histories.append(list(self.core.chat_history))
+            return mock_async_iterator(
+                [
+                    {
+                        "done": True,
+                        "message": {"role": "assistant", "tool_calls": [tool_call]},
+                    }
+                ]
+            )
+
+        mock_get_llm.side_effect = llm_response
+        with patch.object(Constant, "max_chat_iterations", 2), patch.object(
+            self.core, "_execute_tool", new_callable=AsyncMock, return_value="ok"
+        ):
+            await self.core.start_iterations(0, [])
+
+        conclude = {"role": "system", "content": Constant.system_conclude_soon}
+        self.assertEqual(len(histories), 2)
+        self.assertNotIn(conclude, histories[0])
+        self.assertEqual(histories[1][-1], conclude)
+
+    def test_store_llm_response_skips_mutating_tool_calls(self):
+        """Test that answers requesting workspace changes are never cached."""
+        edit = {
+            "role": "assistant",
+            "tool_calls": [{"function": {"name": "edit_file", "arguments": {}}}],
+        }
+        search = {
+            "role": "assistant",
+            "tool_calls": [
+                {"function": {"name": "list_dir", "arguments": '{"target_file": "."}'}}
+            ],
+        }
+
+        self.core._store_llm_response(b"edit", edit)
+        self.core._store_llm_response(b"search", search)
+
+        self.assertEqual(list(self.core._llm_cache), [b"search"])
+
+    def test_store_llm_response_skips_empty_and_malformed_replies(self):
+        """Test that failed replies are not cached, so a retry asks the LLM again."""
+        replies = {
+            b"empty": {"role": "assistant", "content": "  "},
+            b"bad_args": {
+                "role": "assistant",
+                "tool_calls": [{"function": {"name": "list_dir", "arguments": "{"}}],
+            },
+            b"unknown": {
+                "role": "assistant",
+                "tool_calls": [{"function": {"name": "rm_rf", "arguments": {}}}],
+            },
+            b"not_list": {"role": "assistant", "tool_calls": "list_dir"},
+        }
+        for key, reply in replies.items():
+            self.core._store_llm_response(key, reply)
+
+        self.assertEqual(list(self.core._llm_cache), [])
+
+    @patch(
+        "apollo.tools.core.ApolloCore._get_llm_response_from_ollama",
+        new_callable=AsyncMock,
+    )
+    async def test_start_iterations_retries_llm_after_empty_reply(self, mock_get_llm):
+        """Test that retrying a prompt after an empty reply calls the LLM again."""
+        replies = iter(["", "Hi!"])
+        mock_get_llm.side_effect = lambda: mock_async_iterator(
+            [{"done": True, "message": {"role": "assistant", "content": next(replies)}}]
+        )
+
+        self.core.chat_history = [{"role": "user", "content": "hello"}]
+        first = await self.core.start_iterations(0, [])
+        self.core.chat_history = [{"role": "user", "content": "hello"}]
+        second = await self.core.start_iterations(0, [])
+
+        self.assertIn("No content or tools", first["response"])
+        self.assertTrue(second["response"].endswith("Hi!"))
+        self.assertEqual(mock_get_llm.call_count, 2)
+
     async def test_execute_tool_no_executor(self):
         """Test _execute_tool when tool_executor is None."""
         self.core.tool_executor = None
@@ -299,6 +593,23 @@ class TestApolloCore(IsolatedAsyncioTestCase):  # Renamed for clarity
         )
         self.assertEqual(mock_executor.execute_tool.call_count, 2)
 
+    async def test_persist_message_saves_in_order_in_background(self):
+        """Test that history writes run in threads, in order, and are flushed on close."""
+        saved = []
+
+        def slow_save(message, role):
+            time.sleep(0.01 if role == "user" else 0)
+            saved.append((role, message))
+
+        with patch("apollo.tools.core.save_user_history_to_json", slow_save):
+            self.core.persist_message("question", "user")
+            self.core.persist_message("answer", "assistant")
+            self.assertEqual(saved, [])  # Nothing is written on the calling path
+            with patch.object(self.core, "ollama_client", MagicMock(close=AsyncMock())):
+                await self.core.aclose()
+
+        self.assertEqual(saved, [("user", "question"), ("assistant", "answer")])
+
     def test_set_tool_executor(self):
         """Test set_tool_executor method."""
         new_executor = ToolExecutor(workspace_path="/new_ws")
@@ -306,56 +617,68 @@ class TestApolloCore(IsolatedAsyncioTestCase):  # Renamed for clarity
         self.assertIs(self.core.tool_executor, new_executor)
 
     @patch("apollo.tools.core.uuid.uuid4")
-    @patch("apollo.tools.core.print")  # Mock print to avoid console output during tests
-    async def test_initialize_chat_session_new_session(self, mock_print, mock_uuid):
+    async def test_initialize_chat_session_new_session(self, mock_uuid):
         """Test _initialize_chat_session for a new session."""
         mock_uuid.return_value = "test-session-id"
         self.core.session_id = None  # Ensure it's a new session
         self.core.permanent_history = []
 
-        self.core._initialize_chat_session("First message")
+        with self.assertLogs("apollo.tools.core", level="INFO") as logs:
+            self.core._initialize_chat_session("First message")
 
         self.assertEqual(self.core.session_id, "test-session-id")
-        mock_print.assert_any_call("[INFO] New chat session: test-session-id")
+        self.assertIn(
+            "INFO:apollo.tools.core:New chat session: test-session-id", logs.output
+        )
         self.assertEqual(len(self.core.permanent_history), 1)
         self.assertEqual(
             self.core.permanent_history[0], {"role": "user", "content": "First message"}
         )
         self.assertEqual(self.core.chat_history, self.core.permanent_history)
 
-    @patch("apollo.tools.core.print")
-    async def test_initialize_chat_session_existing_session_new_message(
-        self, mock_print
-    ):
+    async def test_initialize_chat_session_existing_session_new_message(self):
         """Test _initialize_chat_session with an existing session and new message."""
         self.core.session_id = "existing-id"
         self.core.permanent_history = [{"role": "user", "content": "Old message"}]
 
-        self.core._initialize_chat_session("New message")
+        with self.assertNoLogs("apollo.tools.core", level="INFO"):
+            self.core._initialize_chat_session("New message")
 
         self.assertEqual(len(self.core.permanent_history), 2)
         self.assertEqual(
             self.core.permanent_history[1], {"role": "user", "content": "New message"}
         )
         self.assertEqual(self.core.chat_history, self.core.permanent_history)
-        mock_print.assert_not_called()  # No "New chat session" print
 
-    @patch("apollo.tools.core.print")
-    async def test_initialize_chat_session_existing_session_same_message(
-        self, mock_print
-    ):
+    async def test_initialize_chat_session_existing_session_same_message(self):
         """Test _initialize_chat_session with an existing session and same last message."""
         self.core.session_id = "existing-id"
         self.core.permanent_history = [{"role": "user", "content": "Same message"}]
 
-        self.core._initialize_chat_session(
-            "Same message"
-        )  # Input text is the same as last history
+        with self.assertLogs("apollo.tools.core", level="DEBUG") as logs:
+            # Input text is the same as last history
+            self.core._initialize_chat_session("Same message")
 
         self.assertEqual(len(self.core.permanent_history), 1)  # History should not grow
         self.assertEqual(self.core.chat_history, self.core.permanent_history)
-        # The print(f"Chat History {self.chat_history}") should be called in this case
-        mock_print.assert_called_once_with(f"Chat History {self.core.chat_history}")
+        # The chat history is logged at debug level in this case
+        self.assertEqual(
+            logs.output,
+            [f"DEBUG:apollo.tools.core:Chat History {self.core.chat_history}"],
+        )
+
+    async def test_initialize_chat_session_copies_only_the_recent_window(self):
+        """Test that a long permanent history is windowed, then trimmed as before."""
+        self.core.session_id = "existing-id"
+        self.core.permanent_history = [
+            {"role": "user", "content": str(i)} for i in range(100)
+        ]
+
+        with patch.object(Constant, "max_llm_history_messages", 4):
+            self.core._initialize_chat_session("New message")
+
+        self.assertEqual(len(self.core.permanent_history), 101)
+        self.assertEqual(self.core.chat_history, self.core.permanent_history[-3:])
 
 
 if __name__ == "__main__":
@@ -2,8 +2,15 @@ import unittest
 from unittest.mock import patch, MagicMock, AsyncMock
 from unittest import IsolatedAsyncioTestCase
 import os
+import tempfile
 
-from apollo.tools.files import list_dir, remove_dir, delete_file, create_file
+from apollo.tools.files import (
+    list_dir,
+    remove_dir,
+    delete_file,
+    create_file,
+    edit_file,
+)
 
 
 def mock_aiofiles_open_factory(read_data=""):
@@ -163,6 +170,118 @@ class TestFileOperations(IsolatedAsyncioTestCase):
                 result["error"],
             )
 
+    async def test_paths_in_sibling_directory_are_rejected(self):
+        """Test that a sibling sharing the workspace name prefix is outside it."""
+        with patch("aiofiles.os.remove") as mock_remove, self.assertLogs(
+            "apollo.tools.files", level="ERROR"
+        ):
+            result = await delete_file(self.agent, "../workspace2/secret.txt")
+
+        self.assertFalse(result["success"])
+        self.assertIn("outside workspace", result["error"])
+        mock_remove.assert_not_called()
+
+    async def test_list_dir_splits_directories_and_files(self):
+        """Test that list_dir classifies entries and reports missing or file paths."""
+        with tempfile.TemporaryDirectory() as workspace:
+            os.makedirs(os.path.join(workspace, "pkg"))
+            with open(os.path.join(workspace, "a.py"), "w", encoding="utf-8") as f:
+                f.write("x")
+            agent = MagicMock(workspace_path=workspace, abs_workspace_path=workspace)
+
+            result = await list_dir(agent, ".")
+            self.assertEqual(result["directories"], ["pkg"])
+            self.assertEqual(result["files"], ["a.py"])
+
+            with self.assertLogs("apollo.tools.files", level="ERROR"):
+                missing = await list_dir(agent, "gone")
+                not_dir = await list_dir(agent, "a.py")
+            self.assertIn("Path does not exist", missing["error"])
+            self.assertIn("Path is not a directory", not_dir["error"])
+
+    async def test_edit_file_replaces_content_atomically(self):
+        """Test that edits go through a temporary file and keep the file mode."""
+        with tempfile.TemporaryDirectory() as workspace:
+            path = os.path.join(workspace, "notes.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("one\n")
+            os.chmod(path, 0o640)
+            agent = MagicMock(workspace_path=workspace, abs_workspace_path=workspace)
+            instructions = {"operation": "append", "content": "two\n"}
+
+            result = await edit_file(agent, "notes.txt", instructions, "test")
+
+            self.assertTrue(result["success"])
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(f.read(), "one\ntwo\n")
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o640)
+            self.assertEqual(os.listdir(workspace), ["notes.txt"])
+
+            with patch("os.replace", side_effect=OSError("disk full")), self.assertLogs(
+                "apollo.tools.files", level="ERROR"
+            ):
+                result = await edit_file(agent, "notes.txt", instructions, "test")
+
+            self.assertFalse(result["success"])
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(f.read(), "one\ntwo\n")  # Original left intact
+            self.assertEqual(os.listdir(workspace), ["notes.txt"])
+
+    async def test_edit_file_reports_errors_from_worker_thread(self):
+        """Test that missing files and failed edits are reported without writing."""
+        with tempfile.TemporaryDirectory() as workspace:
+            path = os.path.join(workspace, "notes.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("one\n")
+            agent = MagicMock(workspace_path=workspace, abs_workspace_path=workspace)
+
+            with self.assertLogs("apollo.tools.files", level="ERROR"), patch(
+                "apollo.tools.files._write_file_atomic"
+            ) as mock_write:
+                missing = await edit_file(
+                    agent, "gone.txt", {"operation": "append"}, "test"
+                )
+                bad_line = await edit_file(
+                    agent,
+                    "notes.txt",
+                    {"operation": "delete_line", "line_number": 5},
+                    "test",
+                )
+
+        self.assertIn("File does not exist", missing["error"])
+        self.assertEqual(bad_line["error"], "Line 5 out of bounds (1 to 1).")
+        mock_write.assert_not_called()
+
+    async def test_edit_file_replace_skips_reading_the_file(self):
+        """Test that replacing the whole content does not read the old content."""
+        with tempfile.TemporaryDirectory() as workspace:
+            path = os.path.join(workspace, "notes.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("old\n")
+            agent = MagicMock(workspace_path=workspace, abs_workspace_path=workspace)
+            instructions = {"operation": "replace_file_content", "content": "new\n"}
+
+            with patch("builtins.open", wraps=open) as mock_open_file:
+                result = await edit_file(agent, "notes.txt", instructions, "test")
+
+            self.assertTrue(result["success"])
+            opened = [call.args[0] for call in mock_open_file.call_args_list]
+            self.assertNotIn(path, opened)
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(f.read(), "new\n")
+
+    def test_executor_caches_absolute_workspace_path(self):
+        """Test that the executor recomputes the absolute path only on change."""
+        from apollo.service.tool.executor import ToolExecutor
+
+        executor = ToolExecutor("/test/workspace/../workspace")
+        with patch("os.path.abspath", wraps=os.path.abspath) as mock_abspath:
+            self.assertEqual(executor.abs_workspace_path, "/test/workspace")
+            self.assertEqual(executor.abs_workspace_path, "/test/workspace")
+            executor.workspace_path = "/test/other"
+            self.assertEqual(executor.abs_workspace_path, "/test/other")
+        self.assertEqual(mock_abspath.call_count, 2)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,41 @@
+"""Unit tests for the logging setup module.
+
+This module contains unit tests for the queue-based logging
+configured by apollo.service.log.
+
+Author: Alberto Barrago
+License: BSD 3-Clause License - 2025
+"""
+
+import io
+import logging
+import unittest
+from unittest.mock import patch
+
+from apollo.service.log import setup_logging, stop_logging
+
+
+class TestLogging(unittest.TestCase):
+    """Test cases for the logging setup functions."""
+
+    def tearDown(self):
+        """Stop the listener even if a test failed."""
+        stop_logging()
+
+    def test_records_are_written_by_the_listener(self):
+        """Test that apollo records reach the stream through the queue listener."""
+        stream = io.StringIO()
+        with patch("sys.stderr", stream):
+            listener = setup_logging()
+            self.assertIs(setup_logging(), listener)  # Already running
+
+            logging.getLogger("apollo.tools.core").warning("Loop %s", "detected")
+            logging.getLogger("apollo.tools.core").debug("Not shown")
+            stop_logging()
+
+        self.assertEqual(stream.getvalue(), "[WARNING] Loop detected\n")
+        self.assertTrue(logging.getLogger("apollo").propagate)
+
+
+if __name__ == "__main__":
+    unittest.main()
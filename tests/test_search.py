@@ -7,10 +7,20 @@ Author: Alberto Barrago
 License: BSD 3-Clause License - 2025
 """
 
+import json
+import os
+import re
+import tempfile
+import time
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from unittest import IsolatedAsyncioTestCase
 from apollo.tools.search import (
+    SEARCH_CACHE_TTL_SECONDS,
+    _grep_workspace,
+    _iter_files,
+    _scan_if_matching,
+    clear_search_caches,
     codebase_search,
     grep_search,
     file_search,
@@ -25,15 +35,16 @@ class TestSearchOperations(IsolatedAsyncioTestCase):
         """Set up test fixtures."""
         self.agent = MagicMock()
         self.agent.workspace_path = "/test/workspace"
+        clear_search_caches()
 
     async def test_codebase_search_with_results(self):
         """Test codebase search with matching results."""
         mock_content = "def test_function():\n    return True"
-        with patch("os.walk") as mock_walk, patch(
+        with patch("apollo.tools.search._iter_files") as mock_iter_files, patch(
             "builtins.open", unittest.mock.mock_open(read_data=mock_content)
         ):
 
-            mock_walk.return_value = [("/test/workspace", [], ["test.py"])]
+            mock_iter_files.return_value = [("/test/workspace/test.py", "test.py")]
 
             result = await codebase_search(self.agent, "test_function")
             self.assertEqual(len(result["results"]), 0)
@@ -45,77 +56,393 @@ class TestSearchOperations(IsolatedAsyncioTestCase):
 
     async def test_codebase_search_no_matches(self):
         """Test codebase search with no matching results."""
-        with patch("os.walk") as mock_walk, patch(
+        with patch("apollo.tools.search._iter_files") as mock_iter_files, patch(
             "builtins.open", unittest.mock.mock_open(read_data="unrelated content")
         ):
 
-            mock_walk.return_value = [("/test/workspace", [], ["test.py"])]
+            mock_iter_files.return_value = [("/test/workspace/test.py", "test.py")]
 
             result = await codebase_search(self.agent, "nonexistent")
             self.assertEqual(len(result["results"]), 0)
 
+    async def test_codebase_search_reuses_results_for_same_keywords(self):
+        """Test that a rephrased query with the same keywords hits the cache."""
+        clear_search_caches()
+        with tempfile.TemporaryDirectory() as workspace:
+            file_path = os.path.join(workspace, "handler.py")
+            with open(file_path, "w", encoding="utf-8") as f:
+                f.write("def request_handler():\n    pass\n")
+            self.agent.workspace_path = workspace
+
+            first = await codebase_search(self.agent, "request handler")
+            os.remove(file_path)
+            second = await codebase_search(self.agent, "the handler for request")
+            clear_search_caches()
+            third = await codebase_search(self.agent, "request handler")
+
+        self.assertEqual(len(first["results"]), 1)
+        self.assertEqual(second["results"], first["results"])
+        self.assertEqual(second["query"], "the handler for request")
+        self.assertEqual(third["results"], [])
+
+    async def test_codebase_search_cache_expires(self):
+        """Test that files created outside the agent are found once the TTL passed."""
+        clear_search_caches()
+        with tempfile.TemporaryDirectory() as workspace:
+            self.agent.workspace_path = workspace
+            first = await codebase_search(self.agent, "request handler")
+            with open(os.path.join(workspace, "handler.py"), "w") as f:
+                f.write("def request_handler():\n    pass\n")
+
+            cached = await codebase_search(self.agent, "request handler")
+            with patch(
+                "apollo.tools.search.time.monotonic",
+                return_value=time.monotonic() + SEARCH_CACHE_TTL_SECONDS,
+            ):
+                fresh = await codebase_search(self.agent, "request handler")
+
+        self.assertEqual(first["results"], [])
+        self.assertEqual(cached["results"], [])
+        self.assertEqual([r["file_path"] for r in fresh["results"]], ["handler.py"])
+
+    async def test_codebase_search_reads_candidates_concurrently(self):
+        """Test that matches across batches come back in traversal order."""
+        with tempfile.TemporaryDirectory() as workspace:
+            for index in range(5):
+                with open(
+                    os.path.join(workspace, f"m{index}.py"), "w", encoding="utf-8"
+                ) as f:
+                    f.write("Request handler" if index % 2 == 0 else "unrelated")
+            with open(os.path.join(workspace, "m.bin"), "w", encoding="utf-8") as f:
+                f.write("request handler")
+            self.agent.workspace_path = workspace
+
+            with patch("apollo.tools.search._CODEBASE_READ_BATCH", 2):
+                result = await codebase_search(self.agent, "request handler")
+
+            order = [name for _, name in _iter_files(workspace) if name.endswith(".py")]
+
+        expected = [name for name in order if name in ("m0.py", "m2.py", "m4.py")]
+        self.assertEqual([r["file_path"] for r in result["results"]], expected)
+
+    async def test_codebase_search_skips_dependency_directories(self):
+        """Test that VCS, dependency and cache directories are never searched."""
+        with tempfile.TemporaryDirectory() as workspace:
+            for relative in (
+                "src/app.py",
+                "src/c",
+                "node_modules/lib/index.js",
+                ".git/hooks/hook.py",
+                "pkg/__pycache__/app.py",
+            ):
+                path = os.path.join(workspace, relative)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write("request handler")
+            self.agent.workspace_path = workspace
+
+            result = await codebase_search(self.agent, "request handler")
+
+        self.assertEqual(
+            [r["file_path"] for r in result["results"]], [os.path.join("src", "app.py")]
+        )
+
+    async def test_codebase_search_uses_cached_absolute_workspace(self):
+        """Test that the executor's cached absolute workspace path is reused."""
+        with tempfile.TemporaryDirectory() as workspace:
+            with open(os.path.join(workspace, "a.py"), "w", encoding="utf-8") as f:
+                f.write("request handler")
+            self.agent.workspace_path = os.path.join(workspace, "..", "elsewhere")
+            self.agent.abs_workspace_path = workspace
+
+            with patch("os.path.abspath", wraps=os.path.abspath) as mock_abspath:
+                result = await codebase_search(self.agent, "request handler")
+
+        self.assertNotIn(
+            unittest.mock.call(self.agent.workspace_path), mock_abspath.call_args_list
+        )
+        self.assertEqual([r["file_path"] for r in result["results"]], ["a.py"])
+
+    def test_scan_if_matching(self):
+        """Test keyword matching on raw bytes, with a text fallback for non-ASCII."""
+        with tempfile.TemporaryDirectory() as workspace:
+            path = os.path.join(workspace, "notes.md")
+            with open(path, "wb") as f:
+                f.write("Request HANDLER\r\nCaffè\r\n".encode("utf-8"))
+
+            self.assertEqual(
+                _scan_if_matching(path, ["request", "handler"]),
+                "Request HANDLER\nCaffè\n",
+            )
+            self.assertIsNotNone(_scan_if_matching(path, ["caffè"]))
+            self.assertIsNone(_scan_if_matching(path, ["request", "missing"]))
+            with self.assertLogs("apollo.tools.search", level="ERROR"):
+                self.assertIsNone(_scan_if_matching(path + ".gone", ["request"]))
+
+    def test_scan_if_matching_reads_in_chunks(self):
+        """Test that keywords split across chunks match and the snippet is cut."""
+        with tempfile.TemporaryDirectory() as workspace:
+            path = os.path.join(workspace, "big.py")
+            with open(path, "wb") as f:
+                f.write(b"a" * 1000 + b"NEEDLE" + b"b" * 1000)
+
+            with patch("apollo.tools.search._CODEBASE_CHUNK_SIZE", 1003):
+                snippet = _scan_if_matching(path, ["needle", "needleb"])
+                self.assertIsNone(_scan_if_matching(path, ["needle", "absent"]))
+
+        self.assertEqual(snippet, "a" * 500 + "...")
+
     async def test_grep_search_with_results(self):
         """Test grep search with matching results."""
         mock_content = "line1\ntest line\nline3"
-        with patch("os.walk") as mock_walk, patch(
+        with patch(
+            "apollo.tools.search._run_ripgrep", new_callable=AsyncMock
+        ) as mock_rg, patch(
+            "apollo.tools.search._iter_files"
+        ) as mock_iter_files, patch(
             "builtins.open", unittest.mock.mock_open(read_data=mock_content)
         ):
-
-            mock_walk.return_value = [("/test/workspace", [], ["test.txt"])]
+            mock_rg.return_value = None  # The Python fallback reads the files
+            mock_iter_files.return_value = [("/test/workspace/test.txt", "test.txt")]
 
             result = await grep_search(self.agent, "test")
-            self.assertEqual(len(result["results"]), 0)
+            self.assertEqual(
+                result["results"],
+                [{"file": "test.txt", "line_number": 2, "content": "test line"}],
+            )
 
     async def test_grep_search_case_sensitive(self):
         """Test grep search with case sensitivity."""
         mock_content = "TEST\ntest\nTeSt"
-        with patch("os.walk") as mock_walk, patch(
+        with patch(
+            "apollo.tools.search._run_ripgrep", new_callable=AsyncMock
+        ) as mock_rg, patch(
+            "apollo.tools.search._iter_files"
+        ) as mock_iter_files, patch(
             "builtins.open", unittest.mock.mock_open(read_data=mock_content)
         ):
-
-            mock_walk.return_value = [("/test/workspace", [], ["test.txt"])]
+            mock_rg.return_value = None  # The Python fallback reads the files
+            mock_iter_files.return_value = [("/test/workspace/test.txt", "test.txt")]
 
             result = await grep_search(self.agent, "TEST")
-            self.assertEqual(len(result["results"]), 0)
+            self.assertEqual(
+                [r["line_number"] for r in result["results"]], [1]
+            )  # Only the upper-case line
 
     async def test_grep_search_with_include_pattern(self):
         """Test grep search with file pattern inclusion."""
-        with patch("os.walk") as mock_walk, patch(
+        with patch(
+            "apollo.tools.search._run_ripgrep", new_callable=AsyncMock
+        ) as mock_rg, patch(
+            "apollo.tools.search._iter_files"
+        ) as mock_iter_files, patch(
             "builtins.open", unittest.mock.mock_open(read_data="test content")
         ):
-
-            mock_walk.return_value = [("/test/workspace", [], ["test.py", "test.txt"])]
+            mock_rg.return_value = None  # The Python fallback reads the files
+            mock_iter_files.return_value = [
+                ("/test/workspace/test.py", "test.py"),
+                ("/test/workspace/test.txt", "test.txt"),
+            ]
 
             result = await grep_search(self.agent, "test")
-            self.assertEqual(len(result["results"]), 0)
+            self.assertEqual(len(result["results"]), 2)
 
     async def test_grep_search_with_exclude_pattern(self):
         """Test grep search with file pattern exclusion."""
-        with patch("os.walk") as mock_walk, patch(
+        with patch(
+            "apollo.tools.search._run_ripgrep", new_callable=AsyncMock
+        ) as mock_rg, patch(
+            "apollo.tools.search._iter_files"
+        ) as mock_iter_files, patch(
             "builtins.open", unittest.mock.mock_open(read_data="test content")
         ):
+            mock_rg.return_value = None  # The Python fallback reads the files
+            mock_iter_files.return_value = [
+                ("/test/workspace/test.py", "test.py"),
+                ("/test/workspace/test.txt", "test.txt"),
+            ]
 
-            mock_walk.return_value = [("/test/workspace", [], ["test.py", "test.txt"])]
+            result = await grep_search(self.agent, "test")
+            self.assertEqual(len(result["results"]), 2)
 
+    async def test_grep_search_rejects_catastrophic_regex_without_ripgrep(self):
+        """Test that nested unbounded repeats are refused by the Python fallback."""
+        with patch(
+            "apollo.tools.search._run_ripgrep", new_callable=AsyncMock
+        ) as mock_rg, patch("apollo.tools.search._iter_files") as mock_iter_files:
+            mock_rg.return_value = None
+
+            result = await grep_search(self.agent, "(a+)+b")
+
+        mock_iter_files.assert_not_called()
+        self.assertEqual(result["results"], [])
+        self.assertIn("backtrack", result["errors"][0]["error"])
+
+    async def test_grep_search_uses_ripgrep_json_events(self):
+        """Test grep search parsing ripgrep --json match events."""
+        events = [
+            {"type": "begin", "data": {"path": {"text": "/test/workspace/a.py"}}},
+            {
+                "type": "match",
+                "data": {
+                    "path": {"text": "/test/workspace/a.py"},
+                    "lines": {"text": "    test line\n"},
+                    "line_number": 2,
+                },
+            },
+            {"type": "summary", "data": {}},
+        ]
+
+        async def stdout_lines():
+            for event in events:
+                yield (json.dumps(event) + "\n").encode()
+
+        process = MagicMock()
+        process.stdout = stdout_lines()
+        process.returncode = 0
+        process.wait = AsyncMock(return_value=0)
+
+        with patch(
+            "apollo.tools.search.asyncio.create_subprocess_exec",
+            new_callable=AsyncMock,
+            return_value=process,
+        ) as mock_exec:
             result = await grep_search(self.agent, "test")
-            self.assertEqual(len(result["results"]), 0)
+
+        rg_args = mock_exec.call_args.args
+        self.assertIn("--json", rg_args)
+        # Same files as the fallback: hidden and ignored ones, but no VCS data
+        self.assertIn("--hidden", rg_args)
+        self.assertIn("--no-ignore", rg_args)
+        self.assertIn("--glob=!.git", rg_args)
+        self.assertIn("-F", rg_args)  # No regex metacharacters in the query
+        self.assertEqual(
+            result["results"],
+            [{"file": "a.py", "line_number": 2, "content": "test line"}],
+        )
+
+    async def test_grep_search_passes_literal_alternation_as_fixed_strings(self):
+        """Test that foo|bar queries reach ripgrep as fixed-string patterns."""
+
+        async def no_output():
+            return
+            yield  # pragma: no cover
+
+        process = MagicMock()
+        process.stdout = no_output()
+        process.returncode = 1
+        process.wait = AsyncMock(return_value=1)
+
+        with patch(
+            "apollo.tools.search.asyncio.create_subprocess_exec",
+            new_callable=AsyncMock,
+            return_value=process,
+        ) as mock_exec:
+            result = await grep_search(self.agent, "foo|bar_baz")
+            await grep_search(self.agent, "foo|ba+r")
+
+        literal_args, regex_args = [c.args for c in mock_exec.call_args_list]
+        self.assertEqual(
+            literal_args[-7:],
+            ("-F", "-e", "foo", "-e", "bar_baz", "--", "/test/workspace"),
+        )
+        self.assertEqual(result["results"], [])
+        self.assertNotIn("-F", regex_args)
 
     async def test_file_search_with_results(self):
         """Test file search with matching results."""
-        with patch("os.walk") as mock_walk:
-            mock_walk.return_value = [("/test/workspace", [], ["test.txt", "test.py"])]
+        with patch("apollo.tools.search._iter_files") as mock_iter_files:
+            mock_iter_files.return_value = [
+                ("/test/workspace/test.txt", "test.txt"),
+                ("/test/workspace/test.py", "test.py"),
+            ]
 
             result = await file_search(self.agent, "test")
             self.assertEqual(len(result["results"]), 2)
 
     async def test_file_search_no_matches(self):
         """Test file search with no matching results."""
-        with patch("os.walk") as mock_walk:
-            mock_walk.return_value = [("/test/workspace", [], ["other.txt"])]
+        with patch("apollo.tools.search._iter_files") as mock_iter_files:
+            mock_iter_files.return_value = [("/test/workspace/other.txt", "other.txt")]
 
             result = await file_search(self.agent, "test")
             self.assertEqual(len(result["results"]), 0)
 
+    async def test_file_search_reuses_file_index(self):
+        """Test that consecutive file searches share one workspace walk."""
+        with patch("apollo.tools.search._iter_files") as mock_iter_files:
+            mock_iter_files.return_value = [("/test/workspace/test.txt", "test.txt")]
+
+            await file_search(self.agent, "test")
+            result = await file_search(self.agent, "test.txt")
+            self.assertEqual(mock_iter_files.call_count, 1)
+            self.assertEqual(result["results"][0]["file_path"], "test.txt")
+
+            clear_search_caches()
+            await file_search(self.agent, "test")
+            self.assertEqual(mock_iter_files.call_count, 2)
+
+    def test_iter_files_matches_os_walk(self):
+        """Test that the scandir traversal yields the same files as os.walk."""
+        with tempfile.TemporaryDirectory() as workspace:
+            for relative in ("a.py", "pkg/b.py", "pkg/sub/c.md", "other/d.txt"):
+                path = os.path.join(workspace, relative)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write("x")
+            os.symlink(os.path.join(workspace, "pkg"), os.path.join(workspace, "link"))
+
+            expected = [
+                (os.path.join(root, name), name)
+                for root, _, files in os.walk(workspace)
+                for name in files
+            ]
+            self.assertEqual(sorted(_iter_files(workspace)), sorted(expected))
+            self.assertEqual(len(expected), 4)  # The directory symlink is not followed
+
+    def test_grep_workspace_stops_walking_at_cap(self):
+        """Test that the grep fallback stops listing files once the cap is reached."""
+        with tempfile.TemporaryDirectory() as workspace:
+            paths = []
+            for name in ("a.py", "b.py", "c.py"):
+                path = os.path.join(workspace, name)
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write("needle\nneedle\n")
+                paths.append((path, name))
+            walked = []
+
+            def fake_iter_files(_root, _skip_dirs=frozenset()):
+                for entry in paths:
+                    walked.append(entry[1])
+                    yield entry
+
+            with patch("apollo.tools.search._iter_files", fake_iter_files):
+                results, errors = _grep_workspace(
+                    workspace, re.compile("needle"), max_results=3
+                )
+
+        self.assertEqual(len(results), 3)
+        self.assertEqual(errors, [])
+        self.assertEqual(walked, ["a.py", "b.py"])
+
+    def test_grep_workspace_skips_vcs_but_not_hidden_files(self):
+        """Test that the fallback searches the same files as ripgrep does."""
+        with tempfile.TemporaryDirectory() as workspace:
+            for relative in (".env", "build/out.txt", ".git/config"):
+                path = os.path.join(workspace, relative)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write("needle\n")
+            with open(os.path.join(workspace, ".gitignore"), "w") as f:
+                f.write("build/\n")
+
+            results, _ = _grep_workspace(workspace, re.compile("needle"), 10)
+
+        self.assertEqual(
+            sorted(result["file"] for result in results),
+            [".env", os.path.join("build", "out.txt")],
+        )
+
     def test_match_pattern_sync(self):
         """Test pattern matching function."""
         self.assertTrue(match_pattern_sync("test.txt", "*.txt"))
@@ -11,6 +11,7 @@ import unittest
 from unittest.mock import patch, mock_open, call
 import datetime
 import os
+import tempfile
 
 from apollo.service import session as session_service
 from apollo.config import const as apollo_const
@@ -27,7 +28,7 @@ class TestSessionManagement(unittest.TestCase):
         self.mock_strftime_val = "2023-10-26 10:00:00"
 
         self.expected_filename = (
-            f"chat_history_{self.mock_today.strftime('%Y%m%d')}.json"
+            f"chat_history_{self.mock_today.strftime('%Y%m%d')}.jsonl"
         )
         self.expected_filepath = os.path.join(
             self.mock_chat_history_dir, self.expected_filename
@@ -39,7 +40,7 @@ class TestSessionManagement(unittest.TestCase):
         with patch("datetime.date") as mock_date_module:  # Renamed to avoid conflict
             mock_date_module.today.return_value = self.mock_today
             expected_path = os.path.join(
-                base_dir, f"chat_history_{self.mock_today.strftime('%Y%m%d')}.json"
+                base_dir, f"chat_history_{self.mock_today.strftime('%Y%m%d')}.jsonl"
             )
             self.assertEqual(
                 session_service.get_daily_session_filename(base_dir), expected_path
@@ -142,33 +143,30 @@ class TestSessionManagement(unittest.TestCase):
 
     def test_save_invalid_input(self):
         """Test saving with invalid message or role."""
+        expected_log = [
+            "WARNING:apollo.service.session:"
+            "Invalid message content or role provided. Skipping save."
+        ]
         # Test invalid message type
-        result_tuple = self.run_save_test(message_to_save=123, role_to_save="user")
-        returned_path = result_tuple[0]
-        mock_print = result_tuple[6]
-        mock_print.assert_any_call(
-            "[WARNING] Invalid message content or role provided. Skipping save."
-        )
-        self.assertIsNone(returned_path)
+        with self.assertLogs("apollo.service.session", level="WARNING") as logs:
+            result_tuple = self.run_save_test(message_to_save=123, role_to_save="user")
+        self.assertEqual(logs.output, expected_log)
+        self.assertIsNone(result_tuple[0])
 
-        mock_print.reset_mock()
         # Test empty role
-        result_tuple = self.run_save_test(message_to_save="hello", role_to_save="")
-        returned_path = result_tuple[0]
-        mock_print = result_tuple[6]
-        mock_print.assert_any_call(
-            "[WARNING] Invalid message content or role provided. Skipping save."
-        )
-        self.assertIsNone(returned_path)
+        with self.assertLogs("apollo.service.session", level="WARNING") as logs:
+            result_tuple = self.run_save_test(message_to_save="hello", role_to_save="")
+        self.assertEqual(logs.output, expected_log)
+        self.assertIsNone(result_tuple[0])
 
-    def test_save_typeerror_on_json_dump(self):
-        """Test TypeError during json.dump (serialization error)."""
+    def test_save_typeerror_on_json_dumps(self):
+        """Test TypeError during json.dumps (serialization error)."""
         msg, role = "type error", "user"
 
-        with patch("builtins.print") as mock_p, patch(
+        with self.assertLogs("apollo.service.session", level="ERROR") as logs, patch(
             "time.strftime", return_value=self.mock_strftime_val
         ), patch(
-            "json.dump", side_effect=TypeError("Not serializable")
+            "json.dumps", side_effect=TypeError("Not serializable")
         ) as mock_jd, patch(
             "json.load", return_value=[]
         ), patch(
@@ -195,13 +193,71 @@ class TestSessionManagement(unittest.TestCase):
                 )
 
             self.assertEqual(returned_path_direct, self.expected_filepath)
-            mock_p.assert_any_call(
-                f"[ERROR] JSON serialization error: Not serializable"
-            )
-            mock_p.assert_any_call(
-                "Not saving chat history due to serialization error. Please check message structure."
+            self.assertEqual(
+                logs.output,
+                [
+                    "ERROR:apollo.service.session:"
+                    "JSON serialization error: Not serializable",
+                    "ERROR:apollo.service.session:Not saving chat history due to "
+                    "serialization error. Please check message structure.",
+                ],
             )
             mock_jd.assert_called_once()
+            m_open.assert_not_called()
+
+    def test_save_appends_lines_and_compacts(self):
+        """Test that messages are appended as JSON lines and trimmed past the limit."""
+        with tempfile.TemporaryDirectory() as session_dir, patch.object(
+            apollo_const.Constant, "chat_history_dir", session_dir
+        ), patch.object(
+            apollo_const.Constant, "max_history_messages", self.mock_max_messages
+        ), patch.dict(
+            session_service._record_counts, clear=True
+        ):
+            file_path = session_service.save_user_history_to_json(
+                "  hello\n  there ", "user"
+            )
+            history = session_service.load_session_history(file_path)
+            self.assertTrue(file_path.endswith(".jsonl"))
+            self.assertEqual(history[0]["role"], "system")
+            self.assertEqual(history[1], {"role": "user", "content": "hello there"})
+
+            with patch("json.dump") as mock_dump:
+                for i in range(4):
+                    session_service.save_user_history_to_json(f"msg {i}", "assistant")
+            mock_dump.assert_not_called()  # The file is never rewritten as a whole
+
+            history = session_service.load_session_history(file_path)
+            self.assertEqual(history[0]["role"], "system")
+            self.assertEqual(
+                [record["content"] for record in history[1:]], ["msg 2", "msg 3"]
+            )
+
+    def test_save_writes_marker_into_empty_file(self):
+        """Test that an existing but empty session file still gets the marker."""
+        with tempfile.TemporaryDirectory() as session_dir, patch.object(
+            apollo_const.Constant, "chat_history_dir", session_dir
+        ), patch.dict(session_service._record_counts, clear=True):
+            file_path = session_service.get_daily_session_filename(session_dir)
+            open(file_path, "w", encoding="utf-8").close()
+
+            session_service.save_user_history_to_json("hello", "user")
+            history = session_service.load_session_history(file_path)
+
+        self.assertEqual(history[0]["role"], "system")
+        self.assertEqual(history[1:], [{"role": "user", "content": "hello"}])
+
+    def test_load_session_history_logs_corrupted_lines(self):
+        """Test that corrupted lines are skipped with a logged warning."""
+        with tempfile.TemporaryDirectory() as session_dir:
+            file_path = os.path.join(session_dir, "history.jsonl")
+            with open(file_path, "w", encoding="utf-8") as f:
+                f.write('{"role": "user", "content": "hi"}\n{broken\n')
+
+            with self.assertLogs("apollo.service.session", level="WARNING"):
+                history = session_service.load_session_history(file_path)
+
+        self.assertEqual(history, [{"role": "user", "content": "hi"}])
 
 
 if __name__ == "__main__":
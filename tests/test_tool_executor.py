@@ -10,9 +10,17 @@ License: BSD 3-Clause License - 2025
 
 import unittest
 import asyncio
-from unittest.mock import AsyncMock
+import threading
+from unittest.mock import AsyncMock, patch
 
-from apollo.service.tool.executor import ToolExecutor
+import ollama
+
+from apollo.service.tool.executor import (
+    ToolExecutor,
+    serialize_tool_result,
+    tool_call_field,
+)
+from apollo.tools.web import SearchResult
 
 
 class TestToolExecutor(unittest.TestCase):
@@ -54,6 +62,244 @@ class TestToolExecutor(unittest.TestCase):
         self.assertIn("[ERROR]", result)
         self.assertIn("Function 'invalid_func' not found", result)
 
+    def test_execute_tool_converts_search_results_to_dicts(self):
+        """Test that SearchResult tuples reach the LLM as dictionaries."""
+        search = AsyncMock(
+            return_value=[SearchResult(title="T", url="https://u", snippet="S")]
+        )
+        self.tool_executor.register_function("web_search", search)
+        tool_call = {"function": {"name": "web_search", "arguments": {"query": "q"}}}
+
+        result = asyncio.run(self.tool_executor.execute_tool(tool_call))
+
+        self.assertEqual(result, [{"title": "T", "url": "https://u", "snippet": "S"}])
+
+    def test_execute_mutating_tool_clears_search_caches(self):
+        """Test that a workspace-changing tool invalidates cached searches."""
+        self.tool_executor.register_function("edit_file", AsyncMock(return_value={}))
+        tool_call = {"function": {"name": "edit_file", "arguments": {}}}
+
+        with patch(
+            "apollo.service.tool.executor.clear_search_caches"
+        ) as mock_clear_caches:
+            asyncio.run(self.tool_executor.execute_tool(tool_call))
+
+        mock_clear_caches.assert_called_once_with()
+
+    def test_execute_read_only_tool_reuses_result_until_workspace_changes(self):
+        """Test that read-only tool results are cached until a mutating tool runs."""
+        mock_list_dir = AsyncMock(return_value={"files": []})
+        self.tool_executor.register_function("list_dir", mock_list_dir)
+        self.tool_executor.register_function("delete_file", AsyncMock(return_value={}))
+        list_call = {
+            "function": {"name": "list_dir", "arguments": {"target_file": "."}}
+        }
+        delete_call = {"function": {"name": "delete_file", "arguments": {}}}
+
+        asyncio.run(self.tool_executor.execute_tool(list_call))
+        result = asyncio.run(self.tool_executor.execute_tool(list_call))
+        self.assertEqual(result, {"files": []})
+        self.assertEqual(mock_list_dir.await_count, 1)
+
+        asyncio.run(self.tool_executor.execute_tool(delete_call))
+        asyncio.run(self.tool_executor.execute_tool(list_call))
+        self.assertEqual(mock_list_dir.await_count, 2)
+
+    def test_serialize_tool_result(self):
+        """Test that structured tool results are sent to the LLM as compact JSON."""
+        self.assertEqual(serialize_tool_result("plain text"), "plain text")
+        self.assertEqual(
+            serialize_tool_result({"files": ["a.py"], "ok": True}),
+            '{"files":["a.py"],"ok":true}',
+        )
+        self.assertEqual(serialize_tool_result(None), "None")
+
+    def test_execute_sync_tool_runs_in_worker_thread(self):
+        """Test that synchronous tools do not run on the event loop thread."""
+        loop_thread = []
+
+        def sync_tool():
+            return threading.current_thread() is loop_thread[0]
+
+        async def run():
+            loop_thread.append(threading.current_thread())
+            return await self.tool_executor.execute_tool(
+                {"function": {"name": "sync_tool", "arguments": {}}}
+            )
+
+        self.tool_executor.register_function("sync_tool", sync_tool)
+        self.assertFalse(asyncio.run(run()))
+
+    def test_execute_tool_rejects_missing_required_arguments(self):
+        """Test that schema-required arguments are checked before the call."""
+        calls = []
+
+        async def grep_search(agent, query, max_results=50):
+            calls.append(query)
+            return []
+
+        self.tool_executor.register_function("grep_search", grep_search)
+        tool_call = {"function": {"name": "grep_search", "arguments": {}}}
+
+        result = asyncio.run(self.tool_executor.execute_tool(tool_call))
+
+        # 'explanation' is required by the schema but not taken by the function
+        self.assertEqual(
+            result, "[ERROR] Missing required arguments for 'grep_search': query"
+        )
+        self.assertEqual(calls, [])
+
+    def test_execute_tool_does_not_inspect_the_function_per_call(self):
+        """Test that a tool's signature is inspected at registration only."""
+        received = []
+
+        async def list_dir(agent, target_file):
+            received.append((agent, target_file))
+            return {}
+
+        self.tool_executor.register_function("list_dir", list_dir)
+        tool_call = {
+            "function": {
+                "name": "list_dir",
+                "arguments": {"target_file": "src", "explanation": "unused"},
+            }
+        }
+
+        with patch("apollo.service.tool.executor.inspect") as mock_inspect:
+            asyncio.run(self.tool_executor.execute_tool(tool_call))
+
+        mock_inspect.signature.assert_not_called()
+        mock_inspect.iscoroutinefunction.assert_not_called()
+        self.assertEqual(received, [(self.tool_executor, "src")])
+
+    def test_result_cache_evicts_least_recently_used_entry(self):
+        """Test that the read-only result cache is bounded as an LRU."""
+        listed = []
+
+        async def list_dir(agent, target_file):
+            listed.append(target_file)
+            return {"files": []}
+
+        self.tool_executor.register_function("list_dir", list_dir)
+
+        def list_call(target):
+            return {
+                "function": {"name": "list_dir", "arguments": {"target_file": target}}
+            }
+
+        with patch("apollo.service.tool.executor._RESULT_CACHE_MAX_ENTRIES", 2):
+            for target in ("a", "b", "a", "c"):  # "a" is reused before "c" arrives
+                asyncio.run(self.tool_executor.execute_tool(list_call(target)))
+            self.assertEqual(len(listed), 3)
+
+            asyncio.run(self.tool_executor.execute_tool(list_call("a")))
+            self.assertEqual(len(listed), 3)
+            asyncio.run(self.tool_executor.execute_tool(list_call("b")))
+            self.assertEqual(len(listed), 4)
+
+    def test_result_cache_ignores_explanation(self):
+        """Test that calls differing only in explanation share a cache entry."""
+        listed = []
+
+        async def list_dir(agent, target_file, explanation=None):
+            listed.append(target_file)
+            return {"path": target_file, "explanation": explanation, "files": []}
+
+        self.tool_executor.register_function("list_dir", list_dir)
+
+        def list_call(target, explanation):
+            arguments = {"target_file": target, "explanation": explanation}
+            return {"function": {"name": "list_dir", "arguments": arguments}}
+
+        first = asyncio.run(
+            self.tool_executor.execute_tool(list_call("src", "Look at the sources"))
+        )
+        second = asyncio.run(
+            self.tool_executor.execute_tool(list_call("./src/", "Check src again"))
+        )
+
+        self.assertEqual(listed, ["src"])
+        self.assertEqual(first["explanation"], "Look at the sources")
+        self.assertEqual(second["explanation"], "Check src again")
+        self.assertEqual(second["files"], first["files"])
+
+    def test_execute_tool_accepts_ollama_tool_call_objects(self):
+        """Test that Ollama ToolCall objects and dicts are read the same way."""
+        tool_call = ollama.Message.ToolCall(
+            function=ollama.Message.ToolCall.Function(
+                name="test_func", arguments={"arg1": "value1"}
+            )
+        )
+
+        result = asyncio.run(self.tool_executor.execute_tool(tool_call))
+
+        self.assertEqual(result, "test_result")
+        self.assertEqual(tool_call_field(tool_call.function, "name"), "test_func")
+        self.assertEqual(tool_call_field({"id": "1"}, "id"), "1")
+        self.assertIsNone(tool_call_field({}, "function"))
+
+    def test_result_cache_entries_expire(self):
+        """Test that cached read-only results are dropped after the TTL."""
+        listed = []
+
+        async def list_dir(agent, target_file):
+            listed.append(target_file)
+            return {"files": []}
+
+        self.tool_executor.register_function("list_dir", list_dir)
+        tool_call = {
+            "function": {"name": "list_dir", "arguments": {"target_file": "."}}
+        }
+
+        with patch("apollo.service.tool.executor.time.monotonic") as mock_time:
+            mock_time.return_value = 100.0
+            asyncio.run(self.tool_executor.execute_tool(tool_call))
+            mock_time.return_value = 159.0
+            asyncio.run(self.tool_executor.execute_tool(tool_call))
+            self.assertEqual(len(listed), 1)
+
+            mock_time.return_value = 161.0
+            asyncio.run(self.tool_executor.execute_tool(tool_call))
+            self.assertEqual(len(listed), 2)
+
+    def test_execute_tool_reports_malformed_arguments(self):
+        """Test that invalid or non-object JSON arguments become error strings."""
+        invalid = {"function": {"name": "test_func", "arguments": "{not json"}}
+        not_object = {"function": {"name": "test_func", "arguments": "[1, 2]"}}
+
+        invalid_result = asyncio.run(self.tool_executor.execute_tool(invalid))
+        not_object_result = asyncio.run(self.tool_executor.execute_tool(not_object))
+
+        self.assertTrue(invalid_result.startswith("[ERROR] Failed to parse tool call"))
+        self.assertEqual(
+            not_object_result, "[ERROR] Unsupported arguments type: <class 'list'>"
+        )
+        self.test_func.assert_not_awaited()
+
+    def test_result_cache_matches_equivalent_arguments(self):
+        """Test that equivalent path spellings share one cached result."""
+        listed = []
+
+        async def list_dir(agent, target_file):
+            listed.append(target_file)
+            return {"files": []}
+
+        self.tool_executor.register_function("list_dir", list_dir)
+
+        for target in ("src", "./src", "src/", "other"):
+            asyncio.run(
+                self.tool_executor.execute_tool(
+                    {
+                        "function": {
+                            "name": "list_dir",
+                            "arguments": {"target_file": target},
+                        }
+                    }
+                )
+            )
+
+        self.assertEqual(listed, ["src", "other"])
+
 
 if __name__ == "__main__":
     unittest.main()
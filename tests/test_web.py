@@ -8,9 +8,10 @@ License: BSD 3-Clause License - 2025
 """
 
 import unittest
-from unittest.mock import patch, AsyncMock
+from unittest.mock import patch, AsyncMock, MagicMock
 import httpx
 
+from apollo.tools import web
 from apollo.tools.web import web_search, wiki_search
 from unittest import IsolatedAsyncioTestCase
 
@@ -18,11 +19,15 @@ from unittest import IsolatedAsyncioTestCase
 class TestWebOperations(IsolatedAsyncioTestCase):
     """Test cases for web operations."""
 
+    def setUp(self):
+        """Reset the conditional-request cache between tests."""
+        web._etag_cache.clear()
+
     @patch("apollo.tools.web.httpx.AsyncClient")
     async def test_web_search_success(self, MockAsyncClient):
         """Test a successful web search."""
         mock_client_instance = AsyncMock()
-        mock_response = AsyncMock()
+        mock_response = MagicMock()
         mock_response.status_code = 200
         # Simulate DuckDuckGo HTML structure
         mock_response.text = """
@@ -45,16 +50,16 @@ class TestWebOperations(IsolatedAsyncioTestCase):
         results = await web_search("test query")
 
         self.assertEqual(len(results), 2)
-        self.assertEqual(results[0]["title"], "Test Result 1")
-        self.assertEqual(results[0]["url"], "https://test.com/1")
-        self.assertEqual(results[0]["snippet"], "Test snippet 1")
-        self.assertEqual(results[1]["title"], "Test Result 2")
+        self.assertEqual(results[0].title, "Test Result 1")
+        self.assertEqual(results[0].url, "https://test.com/1")
+        self.assertEqual(results[0].snippet, "Test snippet 1")
+        self.assertEqual(results[1].title, "Test Result 2")
 
     @patch("apollo.tools.web.httpx.AsyncClient")
     async def test_web_search_no_results(self, MockAsyncClient):
         """Test web search with no results."""
         mock_client_instance = AsyncMock()
-        mock_response = AsyncMock()
+        mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.text = "<html><body><div>No results found.</div></body></html>"  # HTML with no .result elements
         mock_client_instance.get.return_value = mock_response
@@ -80,7 +85,7 @@ class TestWebOperations(IsolatedAsyncioTestCase):
     async def test_web_search_http_error_status(self, MockAsyncClient):
         """Test web search with an HTTP error status code."""
         mock_client_instance = AsyncMock()
-        mock_response = AsyncMock()
+        mock_response = MagicMock()
         mock_response.status_code = 500
         mock_response.text = "Internal Server Error"
         # If your web_search function has resp.raise_for_status(), this would raise an exception.
@@ -108,11 +113,42 @@ class TestWebOperations(IsolatedAsyncioTestCase):
             len(results), 0
         )  # Or assert specific error handling if implemented
 
+    @patch("apollo.tools.web.httpx.AsyncClient")
+    async def test_web_search_not_modified_reuses_cached_results(self, MockAsyncClient):
+        """Test that a 304 answer returns the results cached for the ETag."""
+        mock_client_instance = AsyncMock()
+        first_response = MagicMock()
+        first_response.status_code = 200
+        first_response.headers = {"ETag": '"abc"'}
+        first_response.text = """
+        <html><body>
+            <div class="result">
+                <a class="result__title">Cached Result</a>
+                <a class="result__url" href="https://test.com/cached"></a>
+                <div class="result__snippet">Cached snippet</div>
+            </div>
+        </body></html>
+        """
+        not_modified_response = MagicMock()
+        not_modified_response.status_code = 304
+        not_modified_response.headers = {}
+        not_modified_response.text = ""
+        mock_client_instance.get.side_effect = [first_response, not_modified_response]
+        MockAsyncClient.return_value.__aenter__.return_value = mock_client_instance
+
+        first_results = await web_search("etag query")
+        second_results = await web_search("etag query")
+
+        self.assertEqual(second_results, first_results)
+        self.assertEqual(second_results[0].title, "Cached Result")
+        _, kwargs = mock_client_instance.get.call_args
+        self.assertEqual(kwargs["headers"], {"If-None-Match": '"abc"'})
+
     @patch("apollo.tools.web.httpx.AsyncClient")
     async def test_wiki_search_success(self, MockAsyncClient):
         """Test a successful wiki search."""
         mock_client_instance = AsyncMock()
-        mock_response = AsyncMock()
+        mock_response = MagicMock()
         mock_response.status_code = 200
         # Simulate Wikipedia HTML structure
         mock_response.text = """
@@ -142,7 +178,7 @@ class TestWebOperations(IsolatedAsyncioTestCase):
     async def test_wiki_search_no_results(self, MockAsyncClient):
         """Test wiki search with no results."""
         mock_client_instance = AsyncMock()
-        mock_response = AsyncMock()
+        mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.text = (
             "<html><body><div>No matching results found.</div></body></html>"
@@ -173,7 +209,7 @@ class TestWebOperations(IsolatedAsyncioTestCase):
     async def test_wiki_search_success(self, MockAsyncClient):
         """Test a successful wiki search."""
         mock_client_instance = AsyncMock()
-        mock_response = AsyncMock()
+        mock_response = MagicMock()
         mock_response.status_code = 200
         # Simulate Wikipedia HTML structure
         mock_response.text = """
@@ -199,18 +235,18 @@ class TestWebOperations(IsolatedAsyncioTestCase):
 
         self.assertEqual(len(results), 2)  # Corrected this line
         # The following assertions should now also pass if parsing is correct
-        self.assertEqual(results[0]["title"], "Test Page 1")
-        self.assertEqual(results[0]["url"], "/wiki/Test_Page_1")
-        self.assertEqual(results[0]["snippet"], "This is a snippet for Test Page 1.")
-        self.assertEqual(results[1]["title"], "Test Page 2")
-        self.assertEqual(results[1]["url"], "/wiki/Test_Page_2")
-        self.assertEqual(results[1]["snippet"], "Snippet for Test Page 2.")
+        self.assertEqual(results[0].title, "Test Page 1")
+        self.assertEqual(results[0].url, "/wiki/Test_Page_1")
+        self.assertEqual(results[0].snippet, "This is a snippet for Test Page 1.")
+        self.assertEqual(results[1].title, "Test Page 2")
+        self.assertEqual(results[1].url, "/wiki/Test_Page_2")
+        self.assertEqual(results[1].snippet, "Snippet for Test Page 2.")
 
     @patch("apollo.tools.web.httpx.AsyncClient")
     async def test_wiki_search_fallback_anchor_tag(self, MockAsyncClient):
         """Test wiki search where the primary anchor selector fails, but the fallback works."""
         mock_client_instance = AsyncMock()
-        mock_response = AsyncMock()
+        mock_response = MagicMock()
         mock_response.status_code = 200
         # Simulate Wikipedia HTML structure with a fallback anchor tag
         mock_response.text = """
@@ -229,15 +265,15 @@ class TestWebOperations(IsolatedAsyncioTestCase):
         results = await wiki_search("test query")
 
         self.assertEqual(len(results), 1)
-        self.assertEqual(results[0]["title"], "Fallback Page Title 1")
-        self.assertEqual(results[0]["url"], "/wiki/Fallback_Page_1")
-        self.assertEqual(results[0]["snippet"], "Snippet for Fallback Page 1.")
+        self.assertEqual(results[0].title, "Fallback Page Title 1")
+        self.assertEqual(results[0].url, "/wiki/Fallback_Page_1")
+        self.assertEqual(results[0].snippet, "Snippet for Fallback Page 1.")
 
     @patch("apollo.tools.web.httpx.AsyncClient")
     async def test_wiki_search_no_anchor_tag_skips_result(self, MockAsyncClient):
         """Test wiki search where a heading has no anchor tag and is skipped."""
         mock_client_instance = AsyncMock()
-        mock_response = AsyncMock()
+        mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.text = """
             <html><body>
@@ -259,9 +295,9 @@ class TestWebOperations(IsolatedAsyncioTestCase):
         results = await wiki_search("test query")
 
         self.assertEqual(len(results), 1)
-        self.assertEqual(results[0]["title"], "Valid Page Title 2")
-        self.assertEqual(results[0]["url"], "/wiki/Valid_Page_2")
-        self.assertEqual(results[0]["snippet"], "Snippet for Valid Page 2.")
+        self.assertEqual(results[0].title, "Valid Page Title 2")
+        self.assertEqual(results[0].url, "/wiki/Valid_Page_2")
+        self.assertEqual(results[0].snippet, "Snippet for Valid Page 2.")
 
 
 if __name__ == "__main__":